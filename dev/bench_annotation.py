@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the Transcript backends in munging.annotation
+
+Usage:
+
+    python dev/bench_annotation.py [refgene] [-n QUERIES]
+
+Builds a GenomeIntervalTree from `refgene` with each backend, then
+annotates the same random intervals with each. Each backend runs in
+its own process so that peak memory use can be compared. Without a
+refgene file, a synthetic table the size of the hg19 refGene table is
+generated.
+
+With --materialize, every Transcript's Exons, UTRs and Introns are
+created up front, which measures the memory used by the annotation
+objects themselves rather than by the queries.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import munging.annotation as ann
+
+def synthetic_refgene(fname, n_transcripts=70000, seed=0, alt_fraction=0):
+    """
+    Write a refGene-formatted table of n_transcripts randomly placed transcripts to fname,
+    alt_fraction of them on unsupported alternate haplotype contigs
+    """
+    rand = random.Random(seed)
+    chroms = ['chr{}'.format(c) for c in ann.chromosome_sort_order]
+    alt_chroms = ['chr6_ssto_hap7', 'chr17_ctg5_hap1', 'chrUn_gl000220', 'chr4_ctg9_hap1']
+    with open(fname, 'w') as f:
+        for i in range(n_transcripts):
+            exon_count = min(1 + int(rand.expovariate(0.1)), 150)
+            tx_start = rand.randint(10000, 240000000)
+            exon_starts, exon_ends = [], []
+            pos = tx_start
+            for e in range(exon_count):
+                exon_starts.append(pos)
+                pos += rand.randint(50, 300)
+                exon_ends.append(pos)
+                pos += rand.randint(500, 20000)
+            tx_end = exon_ends[-1]
+            cds_start = rand.randint(exon_starts[0], exon_ends[0])
+            cds_end = rand.randint(exon_starts[-1], tx_end) if exon_count > 1 else rand.randint(cds_start, tx_end)
+            fields = [i % 1000, 'NM_{:06d}'.format(i), rand.choice(alt_chroms if rand.random() < alt_fraction else chroms), rand.choice('+-'),
+                      tx_start, tx_end, cds_start, cds_end, exon_count,
+                      ''.join('{},'.format(x) for x in exon_starts),
+                      ''.join('{},'.format(x) for x in exon_ends),
+                      0, 'GENE{}'.format(i // 3), 'cmpl', 'cmpl',
+                      ''.join('{},'.format(rand.choice([-1, 0, 1, 2])) for x in exon_starts)]
+            f.write('\t'.join(str(x) for x in fields) + '\n')
+
+def random_queries(refgene, n, seed=1):
+    """Return n (chrom, start, stop) intervals, mostly falling within transcripts in refgene"""
+    rand = random.Random(seed)
+    spans = []
+    with open(refgene) as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            row = line.split('\t')
+            if row[2] in ann.chromosomes:
+                spans.append((ann.chromosomes[row[2]], int(row[4]), int(row[5])))
+    queries = []
+    for i in range(n):
+        chrom, tx_start, tx_end = rand.choice(spans)
+        start = rand.randint(tx_start - 1000, tx_end)
+        queries.append((chrom, start, start + rand.choice([1, 1, 10, 100, 5000])))
+    return queries
+
+def materialize(gt):
+    """Create every Exon, UTR and Intron of every Transcript in gt, returning them in a list"""
+    subtranscripts = []
+    for tree in gt.values():
+        for interval in tree:
+            t = interval[2]
+            for i in range(t.exon_count):
+                subtranscripts.extend(t._exon_subtranscripts(i))
+            subtranscripts.extend(t._intron(i) for i in range(t.exon_count - 1))
+    return subtranscripts
+
+def run_backend(backend, refgene, queries, materialize_all=False):
+    """Return (build seconds, query seconds, peak RSS in MB, annotations) for one backend"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.time()
+    gt = ann.GenomeIntervalTree.from_table(refgene, backend=backend)
+    if materialize_all:
+        subtranscripts = materialize(gt)
+    build = time.time() - t0
+
+    t0 = time.time()
+    annotations = []
+    for chrom, start, stop in queries:
+        transcripts = [x[2] for x in gt[chrom][start:stop]]
+        annotations.append((ann.gene_info_from_transcripts(transcripts, start, stop),
+                            ann.region_info_from_transcripts(transcripts, start, stop),
+                            ann.transcript_info_from_transcripts(transcripts, start, stop)))
+    query = time.time() - t0
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024.0
+    return build, query, rss, annotations
+
+def _run_backend(args):
+    return run_backend(*args)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('refgene', nargs='?',
+                        help='RefGene file [default: a synthetic hg19-sized table]')
+    parser.add_argument('-n', '--queries', type=int, default=20000,
+                        help='Number of intervals to annotate [%(default)s]')
+    parser.add_argument('-m', '--materialize', action='store_true',
+                        help='Create every Exon, UTR and Intron before querying')
+    args = parser.parse_args(argv)
+
+    refgene = args.refgene
+    if refgene is None:
+        fd, refgene = tempfile.mkstemp(suffix='.refGene.txt')
+        os.close(fd)
+        synthetic_refgene(refgene)
+    queries = random_queries(refgene, args.queries)
+
+    results = {}
+    print '{:<8}{:>12}{:>12}{:>12}'.format('backend', 'build (s)', 'query (s)', 'RSS (MB)')
+    for backend in sorted(ann.TRANSCRIPT_BACKENDS):
+        # a fresh process per backend, so peak RSS is not shared between them
+        pool = multiprocessing.Pool(1)
+        build, query, rss, results[backend] = pool.apply(_run_backend, [(backend, refgene, queries, args.materialize)])
+        pool.close()
+        print '{:<8}{:>12.2f}{:>12.2f}{:>12.1f}'.format(backend, build, query, rss)
+
+    print 'identical annotations:', results['array'] == results['tree']
+    if args.refgene is None:
+        os.remove(refgene)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+Benchmark chromosome filtering in GenomeIntervalTree.from_table
+
+Usage:
+
+    python dev/bench_chromosomes.py [refgene] [-r REPEAT]
+
+Compares the per-row `row['chrom'] in chromosomes.keys()` check that
+from_table used to make (a list scan in Python 2) with the vectorized
+normalize_chroms filter, and times from_table as a whole with each.
+Without a refgene file, a synthetic table the size of the hg19 refGene
+table is generated, with 10% of its transcripts on alternate haplotype
+contigs as in the real table.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import munging.annotation as ann
+
+from bench_annotation import synthetic_refgene
+
+def filter_keys(records):
+    """The records on supported chromosomes, checked as from_table used to"""
+    return [row for row in records if row['chrom'] in ann.chromosomes.keys()]
+
+def filter_normalized(data):
+    """The rows of data on supported chromosomes, checked as from_table does now"""
+    return data[ann.normalize_chroms(data['chrom']).notnull()]
+
+def from_table_keys(refgene):
+    """GenomeIntervalTree.from_table with the previous chromosome check"""
+    gtree = ann.GenomeIntervalTree('array')
+    for row in filter_keys(ann.UCSCTable(refgene, transcript_fields=True).data.to_dict(orient='records')):
+        gtree.addi(row)
+    return gtree
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('refgene', nargs='?',
+                        help='RefGene file [default: a synthetic hg19-sized table]')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Best of this many runs [%(default)s]')
+    args = parser.parse_args(argv)
+
+    refgene = args.refgene
+    if refgene is None:
+        fd, refgene = tempfile.mkstemp(suffix='.refGene.txt')
+        os.close(fd)
+        synthetic_refgene(refgene, alt_fraction=0.1)
+
+    data = ann.UCSCTable(refgene, transcript_fields=True).data
+    records = data.to_dict(orient='records')
+    print '{} rows'.format(len(data))
+    assert filter_keys(records) == filter_normalized(data).to_dict(orient='records')
+    for name, func, arg in [('filter: chromosomes.keys()', filter_keys, records),
+                            ('filter: normalize_chroms', filter_normalized, data),
+                            ('from_table: chromosomes.keys()', from_table_keys, refgene),
+                            ('from_table: normalize_chroms', lambda r: ann.GenomeIntervalTree.from_table(r, backend='array'), refgene)]:
+        best = min(timeit.repeat(lambda: func(arg), number=1, repeat=args.repeat))
+        print '{:<34}{:>8.3f} s'.format(name, best)
+
+    if args.refgene is None:
+        os.remove(refgene)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""
+Benchmark make_cnv_plottable.add_annotations
+
+Usage:
+
+    python dev/bench_cnv_plottable.py [refgene] [cnr] [-n BINS]
+
+Annotates the bins of a CNVkit .cnr file with the bulk add_annotations
+and with the previous row-by-row implementation (iterrows, one
+IntervalTree query and df.at assignments per bin), checks that the two
+agree, and reports the time taken by each. Without a refgene file or a
+.cnr file, synthetic ones the size of the hg19 refGene table and of an
+exome panel's bins are generated.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+import munging.annotation as ann
+from munging.subcommands import make_cnv_plottable
+
+from bench_annotation import synthetic_refgene
+
+def synthetic_cnr(fname, refgene, n_bins=300000, seed=2):
+    """Write a CNVkit .cnr file of n_bins bins, most of them tiling exons in refgene, to fname"""
+    rand = random.Random(seed)
+    exons = []
+    with open(refgene) as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            row = line.split('\t')
+            if row[2] in ann.chromosomes:
+                for start, end in zip(row[9].split(',')[:-1], row[10].split(',')[:-1]):
+                    exons.append((row[2], int(start), int(end), row[12]))
+    with open(fname, 'w') as f:
+        f.write('chromosome\tstart\tend\tgene\tdepth\tlog2\tweight\n')
+        for i in range(n_bins):
+            chrom, start, end, gene = rand.choice(exons)
+            if rand.random() < 0.2:
+                # an antitarget bin somewhere between exons
+                start = rand.randint(10000, 240000000)
+                end = start + rand.randint(1000, 100000)
+                gene = 'Antitarget' if rand.random() < 0.5 else '-'
+            f.write('{}\t{}\t{}\t{}\t{:.2f}\t{:.4f}\t{:.4f}\n'.format(
+                chrom, start, end, gene, rand.uniform(0, 500), rand.gauss(0, 0.5), rand.random()))
+
+def add_annotations_iterrows(df, genome_tree):
+    """The row-by-row implementation of make_cnv_plottable.add_annotations that the bulk path replaced"""
+    for i, row in df.iterrows():
+        chrom = row['chr']
+        start = int(row['start_pos'])
+        end = int(row['end_pos']) + 1
+        transcript_list = sorted(genome_tree[chrom][start:end])
+        if transcript_list:
+            t = transcript_list[0][2]
+            df.at[i, 'gene'] = t.gene
+            df.at[i, 'transcript'] = t.id
+            exons = sorted(t.get_exons(start, end, report_utr=False))
+            if exons:
+                df.at[i, 'exon'] = str(exons[0].number)
+        else:
+            df.at[i, 'gene'] = 'intergenic'
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('refgene', nargs='?',
+                        help='RefGene file [default: a synthetic hg19-sized table]')
+    parser.add_argument('cnr', nargs='?',
+                        help='CNVkit .cnr file [default: synthetic bins over refgene]')
+    parser.add_argument('-n', '--bins', type=int, default=300000,
+                        help='Number of synthetic bins [%(default)s]')
+    args = parser.parse_args(argv)
+
+    tmpfiles = []
+    refgene = args.refgene
+    if refgene is None:
+        fd, refgene = tempfile.mkstemp(suffix='.refGene.txt')
+        os.close(fd)
+        synthetic_refgene(refgene)
+        tmpfiles.append(refgene)
+    cnr = args.cnr
+    if cnr is None:
+        fd, cnr = tempfile.mkstemp(suffix='.cnr')
+        os.close(fd)
+        synthetic_cnr(cnr, refgene, args.bins)
+        tmpfiles.append(cnr)
+
+    gt = ann.GenomeIntervalTree.from_table(refgene, backend='array')
+    df = make_cnv_plottable.parse_cnvkit_file(cnr)
+    gt.load_all()
+    print '{} bins'.format(len(df))
+
+    results = {}
+    for name, add_annotations in [('bulk', make_cnv_plottable.add_annotations),
+                                  ('iterrows', add_annotations_iterrows)]:
+        annotated = df.copy()
+        t0 = time.time()
+        add_annotations(annotated, gt)
+        print '{:<10}{:>10.2f} s'.format(name, time.time() - t0)
+        results[name] = annotated[['gene', 'transcript', 'exon']]
+
+    print 'identical annotations:', results['bulk'].equals(results['iterrows'])
+    for fname in tmpfiles:
+        os.remove(fname)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
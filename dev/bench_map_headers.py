@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+Benchmark annovar_summary.map_headers
+
+Usage:
+
+    python dev/bench_map_headers.py [path] [-r REPEAT]
+
+Reads the annovar outputs under `path` (default:
+testfiles/annovar_summary) with map_headers, and with the previous
+implementation that built its dicts with zip and get_location(**kwargs)
+for every row, checks that the two agree, and reports the rows per
+second of each. Files are matched to snp_file_types by the part of
+their name after the sample prefix, with or without 'merged.'.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from munging.annotation import get_location
+from munging.subcommands import annovar_summary
+from munging.subcommands.annovar_summary import variant_headers, snp_file_types
+
+testfiles = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles', 'annovar_summary')
+
+def map_headers_dicts(fname, header_ids, variant_idx):
+    """The implementation of annovar_summary.map_headers that the projector replaced"""
+    with open(fname, 'rU') as infile:
+        reader = csv.reader(infile, delimiter='\t')
+        for row in reader:
+            variant_id = tuple(row[i] for i in variant_idx)
+            variant_dict = dict(zip(variant_headers, variant_id))
+            data = dict((key, row[i]) for i, key in header_ids.items() if row[i].strip())
+            data['Position'] = get_location(**variant_dict)
+            yield (variant_id, dict(data, **variant_dict))
+
+def map_headers_projector(fname, header_ids, variant_idx, positions):
+    return annovar_summary.map_headers(fname, header_ids, variant_idx, positions)
+
+def inputs(path):
+    """The (fname, header_ids, variant_idx) of each annovar output under path"""
+    for fname in sorted(os.listdir(path)):
+        try:
+            _, file_type = fname.split('.', 1)
+        except ValueError:
+            continue
+        for key in [file_type, 'merged.' + file_type]:
+            if key in snp_file_types:
+                header_ids, variant_idx = snp_file_types[key]
+                yield os.path.join(path, fname), header_ids, variant_idx
+                break
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', default=testfiles,
+                        help='Directory of annovar outputs [testfiles/annovar_summary]')
+    parser.add_argument('-r', '--repeat', type=int, default=20,
+                        help='Times to read every file [%(default)s]')
+    args = parser.parse_args(argv)
+
+    files = list(inputs(args.path))
+    results = {}
+    print '{:<12}{:>10}{:>14}'.format('map_headers', 'rows', 'rows/s')
+    for name, read in [('dicts', lambda f, positions: map_headers_dicts(*f)),
+                       ('projector', lambda f, positions: map_headers_projector(*(f + (positions,))))]:
+        best = None
+        for r in range(args.repeat):
+            positions = {}
+            t0 = time.time()
+            rows = [list(read(f, positions)) for f in files]
+            elapsed = time.time() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = rows
+        n = sum(len(x) for x in rows)
+        print '{:<12}{:>10}{:>14.0f}'.format(name, n, n / best)
+
+    print 'identical rows:', results['dicts'] == results['projector']
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
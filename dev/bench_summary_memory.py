@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the memory used by the snp top level summary
+
+Usage:
+
+    python dev/bench_summary_memory.py [path] [-s SAMPLES] [-n VARIANTS]
+
+Parses the *.SNP_Analysis.txt files under `path` with parsers.parse,
+keeping whole analysis rows as the annotation of each variant (as parse
+used to) and keeping only the projected, interned annotation_headers.
+Each runs in its own process so that peak memory use can be compared.
+Without a path, a synthetic run of SAMPLES samples sharing a pool of
+VARIANTS variants is generated, with the columns of the SNP_Analysis
+files in testfiles.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from itertools import ifilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from collections import defaultdict
+
+from munging import filters, parsers
+from munging.utils import walker
+
+testfiles = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles')
+
+def snp_columns():
+    """The columns of the SNP_Analysis files in testfiles"""
+    fname = next(os.path.join(p.dir, p.fname) for p in walker(testfiles) if filters.snp_analysis(p))
+    with open(fname) as f:
+        return f.readline().rstrip('\r\n').split('\t')
+
+def synthetic_run(path, n_samples=20, n_variants=50000, seed=0):
+    """Write the SNP_Analysis files of n_samples samples under path, returning their sample names"""
+    rand = random.Random(seed)
+    columns = snp_columns()
+    genes = ['GENE{}'.format(i) for i in range(2000)]
+    variants = []
+    for i in range(n_variants):
+        gene = rand.choice(genes)
+        variants.append({
+            'Position': 'chr{}:{}'.format(rand.randint(1, 22), rand.randint(10000, 240000000)),
+            'Ref_Base': rand.choice('ACGT'),
+            'Var_Base': rand.choice('ACGT'),
+            'Gene': gene,
+            'Transcripts': ','.join('{}:NM_{:06d}:exon{}:c.{}A>G'.format(gene, rand.randint(0, 99999), e, rand.randint(1, 5000))
+                                    for e in range(rand.randint(1, 4))),
+            'Variant_Type': rand.choice(['exonic', 'intronic', 'UTR3', 'splicing']),
+        })
+    samples = []
+    for s in range(n_samples):
+        sample = '{}_A01_OPXv4_NA{:05d}_HA0001'.format(s, s)
+        os.makedirs(os.path.join(path, sample))
+        with open(os.path.join(path, sample, sample + '.SNP_Analysis.txt'), 'w') as f:
+            f.write('\t'.join(columns) + '\n')
+            for variant in rand.sample(variants, int(n_variants * 0.7)):
+                row = dict((c, '{:.4f}'.format(rand.random())) for c in columns)
+                row.update(variant)
+                row['Ref_Reads'] = str(rand.randint(0, 500))
+                row['Var_Reads'] = str(rand.randint(0, 500))
+                f.write('\t'.join(row[c] for c in columns) + '\n')
+        samples.append(sample)
+    return samples
+
+def run_parse(path, sort_order, project):
+    """Return (seconds, peak RSS in MB) of parsing the snp summary of the run at path"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if not project:
+        parsers.SUMMARIES['snp'].projector = lambda fieldnames: lambda row: row
+    t0 = time.time()
+    files = parsers.SampleFileIndex(ifilter(filters.any_analysis, walker(path)))
+    result = parsers.parse('snp', files, defaultdict(dict), {}, [], [], sort_order)
+    seconds = time.time() - t0
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024.0
+    return seconds, rss
+
+def _run_parse(args):
+    return run_parse(*args)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?',
+                        help='Path to analysis files [default: a synthetic run]')
+    parser.add_argument('-s', '--samples', type=int, default=20,
+                        help='Number of synthetic samples [%(default)s]')
+    parser.add_argument('-n', '--variants', type=int, default=50000,
+                        help='Number of synthetic variants [%(default)s]')
+    args = parser.parse_args(argv)
+
+    path = args.path
+    if path is None:
+        path = tempfile.mkdtemp(prefix='munge-')
+        sort_order = synthetic_run(path, args.samples, args.variants)
+    else:
+        sort_order = sorted(p.fname.split('.')[0] for p in walker(path) if filters.snp_analysis(p))
+
+    print '{:<16}{:>12}{:>12}'.format('annotation', 'parse (s)', 'RSS (MB)')
+    for name, project in [('whole rows', False), ('projected', True)]:
+        # a fresh process per mode, so peak RSS is not shared between them
+        pool = multiprocessing.Pool(1)
+        seconds, rss = pool.apply(_run_parse, [(path, sort_order, project)])
+        pool.close()
+        print '{:<16}{:>12.2f}{:>12.1f}'.format(name, seconds, rss)
+
+    if args.path is None:
+        shutil.rmtree(path)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
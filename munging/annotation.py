@@ -8,6 +8,7 @@ A Transcript is a class that encapsulates all the information from a row in a UC
 """
 
 import pandas as pd
+import numpy as np
 from collections import namedtuple, defaultdict
 from operator import itemgetter
 import logging
@@ -15,10 +16,16 @@ import sys
 import re
 from intervaltree import Interval, IntervalTree
 from __init__ import __version__
-from urllib import urlopen
-from StringIO import StringIO as BytesIO
-import zlib
 import itertools
+import gzip
+import os
+import hashlib
+import tempfile
+import cPickle as pickle
+import struct
+from functools import partial
+from bisect import bisect_left
+from array import array
 
 pfx_pattern = re.compile('(OPX|BRO|MRW|INT|EPI|IMM|IMD|MONC|UNK|TESTDATA)', re.IGNORECASE)
 pfx_pattern_old = re.compile('^(OPX|LMG|LMED|CON)', re.IGNORECASE)
@@ -35,6 +42,40 @@ chromosomes.update({str(c): c for c in chromosome_sort_order})
 chromosomes.update({i: str(i) for i in range(1, 23)})
 chromosomes.update({23: 'X', 24: 'Y'})
 
+# the default of normalize_chrom, raising a KeyError for unsupported chromosomes
+_UNSUPPORTED = object()
+
+def normalize_chrom(chrom, default=_UNSUPPORTED):
+    """
+    Returns the string representation of a single chromosome chrom (e.g. '1' for 'chr1', '1' or 1)
+    in O(1). Raises a KeyError if chrom is not a supported chromosome, unless a default is given.
+    """
+    try:
+        return chromosomes[chrom]
+    except KeyError:
+        if default is _UNSUPPORTED:
+            raise
+        return default
+
+def normalize_chroms(chroms, default=None):
+    """
+    Returns a pandas Series of the string representations of chroms (a Series or a sequence), with
+    default for unsupported chromosomes. Each distinct value is looked up only once.
+    """
+    if not isinstance(chroms, pd.Series):
+        chroms = pd.Series(list(chroms))
+    codes, uniques = pd.factorize(chroms)
+    # missing values have code -1, which takes the trailing default
+    names = np.array([chromosomes.get(c, default) for c in uniques] + [default], dtype=object)
+    return pd.Series(names[codes], index=chroms.index)
+
+# Prebuilt GenomeIntervalTree indexes are pickled to a cache directory,
+# set with MUNGE_CACHE_DIR. Increment INDEX_FORMAT whenever the layout of
+# GenomeIntervalTree or Transcript changes so that stale indexes are rebuilt.
+INDEX_FORMAT = 4
+CACHE_ENV = 'MUNGE_CACHE_DIR'
+REFGENE_ENV = 'MUNGE_REFGENE'
+
 
 def get_location(chr, start, stop, **kwargs):
     """
@@ -143,9 +184,75 @@ def _check_start_stop(start, stop):
         raise ValueError("start must be < stop")
     return start, stop
 
+def default_cache_dir():
+    """
+    Return the directory holding prebuilt refGene indexes: $MUNGE_CACHE_DIR if set, otherwise ~/.cache/munge
+    """
+    return os.environ.get(CACHE_ENV) or os.path.join(os.path.expanduser('~'), '.cache', 'munge')
+
+def default_refgene():
+    """
+    Returns the path to the local refGene table set by $MUNGE_REFGENE.
+
+    Raises a ValueError if $MUNGE_REFGENE is not set, and an IOError if it does not name a file:
+    refGene tables are never downloaded.
+    """
+    refgene = os.environ.get(REFGENE_ENV)
+    if not refgene:
+        raise ValueError('No refGene table was given and ${} is not set'.format(REFGENE_ENV))
+    if not os.path.isfile(refgene):
+        raise IOError('${} names {}, which is not a file'.format(REFGENE_ENV, refgene))
+    return refgene
+
+def _open_table(path, decompress=None):
+    """
+    Returns an open file for the UCSC table at path. When decompress is None, .gz and .bz2 files are
+    decompressed as they are read (see utils.Opener); decompress = True forces gzip decompression.
+    """
+    # munging.utils imports from this module, so Opener cannot be imported at module level
+    from munging.utils import Opener
+    if decompress is None:
+        return Opener()(path)
+    elif decompress:
+        return Opener()(path) if path.endswith(('.gz', '.bz2')) else gzip.open(path)
+    return open(path, 'rU')
+
+def _index_prefix(refgene, backend):
+    """
+    Return the file name prefix shared by every index built from the refGene file at path refgene
+    """
+    refgene = os.path.abspath(refgene)
+    path_hash = hashlib.sha1(refgene).hexdigest()[:8]
+    return '{}.{}.{}.'.format(os.path.basename(refgene), path_hash, backend)
+
+def refgene_sha1(refgene):
+    """
+    Returns the sha1 of the contents of the refGene file at path refgene
+    """
+    content_hash = hashlib.sha1()
+    with open(refgene, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), ''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+def refgene_index_path(refgene, cache_dir=None, backend='array'):
+    """
+    Returns the path to the prebuilt GenomeIntervalTree index for the refGene file at path refgene.
+
+    The index file name is keyed on the path, size and mtime of the refGene file (as well as
+    INDEX_FORMAT and the munge version), so an index is not reused after the table changes, and
+    finding the index does not read the table. An edit that keeps both the size and the mtime
+    of the table is not noticed: rebuild its index with build_refgene_index.
+    There is a separate index for each Transcript backend (see TRANSCRIPT_BACKENDS).
+    """
+    refgene = os.path.abspath(refgene)
+    stat = os.stat(refgene)
+    fields = [refgene, stat.st_size, stat.st_mtime, INDEX_FORMAT, __version__]
+    key = hashlib.sha1('\t'.join(str(x) for x in fields)).hexdigest()[:16]
+    return os.path.join(cache_dir or default_cache_dir(), '{}{}.gtree'.format(_index_prefix(refgene, backend), key))
+
 class UCSCTable(object):
     '''A container class for the parsing functions, used in GenomeIntervalTree.from_table``.'''
-    URL = 'http://hgdownload.soe.ucsc.edu/goldenPath/hg19/database/refGene.txt.gz'
     REF_GENE_FIELDS = ['bin',
                       'name',
                       'chrom',
@@ -162,15 +269,70 @@ class UCSCTable(object):
                       'cdsStartStat',
                       'cdsEndStat',
                       'exonFrames']
-
-    def __init__(self, fileobj=None, decompress=None):
+    # the only fields used by Transcript, with their types
+    TRANSCRIPT_DTYPES = {'name': str,
+                         'chrom': str,
+                         'strand': str,
+                         'txStart': int,
+                         'txEnd': int,
+                         'cdsStart': int,
+                         'cdsEnd': int,
+                         'exonCount': int,
+                         'exonStarts': str,
+                         'exonEnds': str,
+                         'name2': str,
+                         'exonFrames': str}
+
+    def __init__(self, fileobj=None, decompress=None, transcript_fields=False):
+        """
+        self.data is a DataFrame of every column of the table, or if transcript_fields is True,
+        of only the TRANSCRIPT_DTYPES columns (with those types), as used to build Transcripts
+        """
         if fileobj is None:
-            data = urlopen(URL).read()
-            if (decompress is None and URL.endswith('.gz')) or decompress:
-                data = zlib.decompress(data, 16+zlib.MAX_WBITS)
-            fileobj = BytesIO(data)
+            fileobj = default_refgene()
+
+        if isinstance(fileobj, basestring):
+            with _open_table(fileobj, decompress) as f:
+                self.data = self._read(f, transcript_fields)
+        else:
+            self.data = self._read(fileobj, transcript_fields)
 
-        self.data = pd.read_csv(fileobj, sep='\t', header=None, comment='#', names=UCSCTable.REF_GENE_FIELDS)    
+    @staticmethod
+    def _read(fileobj, transcript_fields=False):
+        """Returns a DataFrame of the table streamed from fileobj"""
+        if not transcript_fields:
+            return pd.read_csv(fileobj, sep='\t', header=None, comment='#', names=UCSCTable.REF_GENE_FIELDS)
+        usecols = [f for f in UCSCTable.REF_GENE_FIELDS if f in UCSCTable.TRANSCRIPT_DTYPES]
+        return pd.read_csv(fileobj, sep='\t', header=None, comment='#', names=UCSCTable.REF_GENE_FIELDS,
+                           usecols=usecols, dtype=UCSCTable.TRANSCRIPT_DTYPES)
+
+def _build_chrom_tree(rows, backend):
+    """
+    Returns an IntervalTree of the Transcripts for rows, a list of split lines from a UCSC RefGene table
+    """
+    transcript = TRANSCRIPT_BACKENDS[backend]
+    transcripts = [transcript(dict(zip(UCSCTable.REF_GENE_FIELDS, row))) for row in rows]
+    # Intervals are not inclusive of the end point, so increment when adding
+    return IntervalTree(Interval(t.tx_start, t.tx_end + 1, t) for t in transcripts)
+
+def _load_chrom_tree(index, offset):
+    """
+    Returns the IntervalTree pickled at offset in the open GenomeIntervalTree index file
+    """
+    index.seek(offset)
+    return pickle.load(index)
+
+def _rebuild_from_table(refgene, index, backend):
+    """
+    Removes the unreadable index for the refGene file at path refgene, returning a lazy
+    GenomeIntervalTree of the table to build its chromosomes from
+    """
+    try:
+        os.remove(index)
+    except OSError:
+        # another process may have removed it first
+        pass
+    return GenomeIntervalTree.from_table(refgene, lazy=True, backend=backend)
 
 class GenomeIntervalTree(defaultdict):
     """
@@ -186,57 +348,376 @@ class GenomeIntervalTree(defaultdict):
     [x[2] for x in GT['2][400000]] is a list of every Transcript that overlaps position 400000 on chromosome 2
 
     NOTE: Queries are assumed to be 0-based and are not inclusive of the upper limit when a range is provided.
+
+    A lazy GenomeIntervalTree (see from_table(lazy=True) and from_index()) only builds the IntervalTree
+    for a chromosome on its first access, so jobs that query a few chromosomes only pay for those.
+    Its unbuilt chromosomes are still members (``chrom in GT``, ``GT.get(chrom)``), and keys(), items()
+    and the like build every chromosome before returning them.
     """
-    def __init__(self):
+    # the index is a footer-terminated sequence of pickles: one IntervalTree per chromosome,
+    # then a dict of {chrom: offset}, then the offset of that dict packed as FOOTER
+    FOOTER = struct.Struct('<Q')
+
+    def __init__(self, backend='tree'):
         super(GenomeIntervalTree, self).__init__(IntervalTree)
+        # the key of TRANSCRIPT_BACKENDS used to create Transcripts
+        self.backend = backend
+        # chromosomes not yet built, mapped to a function returning their IntervalTree
+        self._pending = {}
+        # the open index file of a tree loaded by from_index(), closed by close()
+        self._index = None
+        # a function returning a GenomeIntervalTree to build chromosomes that fail to load from,
+        # and that GenomeIntervalTree once it is needed
+        self._rebuild = None
+        self._rebuilt = None
+        # per-chromosome sorted arrays used by transcripts_many, built on first use
+        self._sorted = {}
+
+    def __missing__(self, chrom):
+        load = self._pending.pop(chrom, None)
+        if load is None:
+            return super(GenomeIntervalTree, self).__missing__(chrom)
+        try:
+            tree = load()
+        except Exception as e:
+            if self._rebuild is None:
+                raise
+            log.warning('could not load chromosome %s from the refGene index (%s), rebuilding', chrom, e)
+            if self._rebuilt is None:
+                self._rebuilt = self._rebuild()
+            tree = self._rebuilt[chrom]
+        self[chrom] = tree
+        if not self._pending:
+            self.close()
+        return tree
+
+    def close(self):
+        """
+        Closes the index file of a GenomeIntervalTree loaded by from_index(), which is done
+        once every chromosome has been built. Chromosomes not yet accessed can not be loaded
+        after the index is closed.
+        """
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def load_all(self):
+        """
+        Builds the IntervalTree of every chromosome that has not been accessed yet
+        """
+        for chrom in list(self._pending):
+            self[chrom]
+
+    # chromosomes not yet built are members of a lazy tree: testing membership does not build
+    # them, and the methods returning or iterating over every chromosome build them all first
+
+    def __contains__(self, chrom):
+        return chrom in self._pending or super(GenomeIntervalTree, self).__contains__(chrom)
+
+    has_key = __contains__
+
+    def get(self, chrom, default=None):
+        if chrom in self._pending:
+            return self[chrom]
+        return super(GenomeIntervalTree, self).get(chrom, default)
+
+    def keys(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).keys()
+
+    def values(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).values()
+
+    def items(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).items()
+
+    def __iter__(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).__iter__()
+
+    def iterkeys(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).iterkeys()
+
+    def itervalues(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).itervalues()
+
+    def iteritems(self):
+        self.load_all()
+        return super(GenomeIntervalTree, self).iteritems()
 
     def addi(self, data):
         """
         Creates a Transcript from data (a row in a pandas dataframe or a correctly formatted dictionary)
         and adds it to the GenomeIntervalTree at the correct location.
         """
-        t = Transcript(data)
+        t = TRANSCRIPT_BACKENDS[self.backend](data)
         chrom = str(t.chrom)
         begin = t.tx_start
         end = t.tx_end
         # Intervals are not inclusive of the end point, so increment when adding
         self[chrom].addi(begin, end + 1, t)
+        self._sorted.pop(chrom, None)
+
+    def _sorted_transcripts(self, chrom):
+        """
+        Returns (transcripts, tx_starts, tx_ends, max_tx_ends) for chrom, where transcripts are sorted
+        in the same order as the chromosome's Intervals and max_tx_ends is the running maximum of tx_ends
+        """
+        if chrom not in self._sorted:
+            transcripts = [x[2] for x in sorted(self[chrom])]
+            tx_starts = np.array([t.tx_start for t in transcripts], dtype=np.int64)
+            tx_ends = [t.tx_end for t in transcripts]
+            max_tx_ends = np.maximum.accumulate(np.array(tx_ends, dtype=np.int64))
+            self._sorted[chrom] = (transcripts, tx_starts, tx_ends, max_tx_ends)
+        return self._sorted[chrom]
+
+    def transcripts_many(self, chroms, starts, stops):
+        """
+        Returns a list with, for each interval [start, stop) on chrom, the list of Transcripts overlapping it,
+        in the order of sorted(self[chrom][start:stop]).
+
+        chroms, starts and stops are equal-length sequences (e.g. columns of a DataFrame). Rather than querying
+        the IntervalTree once per interval, the intervals of each chromosome are located all at once with
+        searchsorted against the chromosome's Transcripts sorted by start.
+
+        NOTE: queries are not inclusive of the upper limit
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        if (stops <= starts).any():
+            raise ValueError("start must be < stop")
+
+        by_chrom = defaultdict(list)
+        for i, chrom in enumerate(chroms):
+            by_chrom[str(chrom)].append(i)
+
+        result = [None] * len(starts)
+        for chrom, rows in by_chrom.items():
+            transcripts, tx_starts, tx_ends, max_tx_ends = self._sorted_transcripts(chrom)
+            rows = np.array(rows)
+            # every Transcript before first ends before start, and every Transcript from last on begins at or after stop
+            firsts = np.searchsorted(max_tx_ends, starts[rows], side='left')
+            lasts = np.searchsorted(tx_starts, stops[rows], side='left')
+            for row, start, first, last in zip(rows, starts[rows], firsts, lasts):
+                result[row] = [transcripts[j] for j in xrange(first, last) if tx_ends[j] >= start]
+        return result
+
+    def annotate_many(self, chroms, starts, stops, report_utr=True):
+        """
+        Annotates every interval [start, stop) on chrom, returning a DataFrame with one row per interval and
+        the columns 'gene', 'transcript' and 'region': the ';'-joined output of gene_info_from_transcripts,
+        transcript_info_from_transcripts and region_info_from_transcripts respectively.
+
+        The returned DataFrame has a default index; assign its columns with .values to align them with the input.
+
+        NOTE: queries are not inclusive of the upper limit
+        """
+        rows = []
+        for transcripts, start, stop in zip(self.transcripts_many(chroms, starts, stops), starts, stops):
+            start, stop = int(start), int(stop)
+            rows.append([';'.join(gene_info_from_transcripts(transcripts, start, stop)),
+                         ';'.join(transcript_info_from_transcripts(transcripts, start, stop, report_utr)),
+                         ';'.join(region_info_from_transcripts(transcripts, start, stop, report_utr))])
+        return pd.DataFrame(rows, columns=['gene', 'transcript', 'region'])
 
     def __len__(self):
+        self.load_all()
         return sum([len(tree) for tree in self.values()])
 
     def __reduce__(self):
+        self.load_all()
         t = defaultdict.__reduce__(self)
         return (t[0], ()) + t[2:]
 
+    def save(self, path):
+        """
+        Saves the GenomeIntervalTree to path as an index that from_index() can load one chromosome
+        at a time. The index is written to a temporary file and renamed into place, so concurrent
+        readers never see a partially written index.
+        """
+        self.load_all()
+        dirname = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                offsets = {}
+                for chrom, tree in self.items():
+                    offsets[chrom] = f.tell()
+                    pickle.dump(tree, f, pickle.HIGHEST_PROTOCOL)
+                footer = f.tell()
+                pickle.dump(offsets, f, pickle.HIGHEST_PROTOCOL)
+                f.write(GenomeIntervalTree.FOOTER.pack(footer))
+            os.rename(tmp, path)
+        except:
+            os.remove(tmp)
+            raise
+
+    @staticmethod
+    def from_index(path, backend='array'):
+        """
+        Returns a lazy GenomeIntervalTree backed by the index saved to path by GenomeIntervalTree.save()
+        """
+        gtree = GenomeIntervalTree(backend)
+        # the open file handle is shared by the chromosome loaders, and stays readable
+        # even if the index is replaced or removed by another process; it is closed
+        # by close(), or once every chromosome has been loaded
+        index = open(path, 'rb')
+        try:
+            index.seek(0, os.SEEK_END)
+            size = index.tell() - GenomeIntervalTree.FOOTER.size
+            if size < 0:
+                raise ValueError('{} is too short to be a refGene index'.format(path))
+            index.seek(size)
+            (footer,) = GenomeIntervalTree.FOOTER.unpack(index.read(GenomeIntervalTree.FOOTER.size))
+            if footer >= size:
+                raise ValueError('{} has an invalid footer'.format(path))
+            index.seek(footer)
+            offsets = pickle.load(index)
+            if index.tell() != size:
+                raise ValueError('{} has an invalid table of chromosomes'.format(path))
+            # each chromosome is pickled in order, so the offsets are distinct and precede the footer
+            ordered = sorted(offsets.values())
+            if ordered and (ordered[0] != 0 or ordered[-1] >= footer or len(set(ordered)) != len(ordered)):
+                raise ValueError('{} has invalid chromosome offsets'.format(path))
+        except:
+            index.close()
+            raise
+        for chrom, offset in offsets.items():
+            gtree._pending[chrom] = partial(_load_chrom_tree, index, offset)
+        gtree._index = index if offsets else None
+        if not offsets:
+            index.close()
+        return gtree
+
+    def save_index(self, refgene, cache_dir=None):
+        """
+        Saves the GenomeIntervalTree as the prebuilt index for the refGene file at path refgene,
+        removing any stale indexes previously built from the same path. Returns the path to the index.
+        """
+        index = refgene_index_path(refgene, cache_dir, self.backend)
+        self.save(index)
+        dirname = os.path.dirname(index)
+        prefix = _index_prefix(refgene, self.backend)
+        for fname in os.listdir(dirname):
+            stale = os.path.join(dirname, fname)
+            if fname.startswith(prefix) and fname.endswith('.gtree') and stale != index:
+                log.info('removing stale refGene index %s', stale)
+                try:
+                    os.remove(stale)
+                except OSError:
+                    # another process may have removed it first
+                    pass
+        return index
+
+    @staticmethod
+    def from_cache(refgene=None, cache_dir=None, backend='array'):
+        '''
+        Returns a ``GenomeIntervalTree`` for the refGene table at path ``refgene`` (default:
+        ``default_refgene()``, the table named by $MUNGE_REFGENE), loading the prebuilt
+        index from ``cache_dir`` (default: ``default_cache_dir()``) when one exists for the current
+        path, size and mtime of the table. Otherwise the tree is built with ``from_table`` and the
+        index is saved for subsequent calls; failing to write the index is logged but is not an error.
+        A chromosome that can not be loaded from the index is built from the table instead, and the
+        index removed so that it is rebuilt by the next call.
+
+        Uses the 'array' Transcript backend by default, which annotates identically to the 'tree'
+        backend using a fraction of the time and memory (see dev/bench_annotation.py).
+        '''
+        if refgene is None:
+            refgene = default_refgene()
+        index = refgene_index_path(refgene, cache_dir, backend)
+        if os.path.exists(index):
+            try:
+                gtree = GenomeIntervalTree.from_index(index, backend)
+            except Exception as e:
+                log.warning('could not load refGene index %s (%s), rebuilding', index, e)
+            else:
+                gtree._rebuild = partial(_rebuild_from_table, refgene, index, backend)
+                return gtree
+        gtree = GenomeIntervalTree.from_table(refgene, backend=backend)
+        try:
+            gtree.save_index(refgene, cache_dir)
+        except (IOError, OSError) as e:
+            log.warning('could not save refGene index %s (%s)', index, e)
+        return gtree
+
     @staticmethod
-    def from_table(fileobj=None, decompress=None):
+    def from_table(fileobj=None, decompress=None, lazy=False, backend='tree'):
         '''
         Index the rows of UCSC tables into a ``GenomeIntervalTree`` 
 
-        The table can be either specified as a ``fileobj`` (in which case the data is read line by line),
-        or via an ``url`` (the ``url`` may be to a ``txt`` or ``txt.gz`` file either online or locally).
-        The type of the table is specified using the ``parser`` parameter. This is a function that takes a line
-        of the file (with no line ending) and returns a dictionary, mapping field names to values. This dictionary will be assigned
-        to the ``data`` field of each interval in the resulting tree.
+        The table can be either specified as an open ``fileobj`` or as the path to a local ``txt`` or ``txt.gz``
+        file. If ``fileobj`` is None, the table named by $MUNGE_REFGENE is used (see ``default_refgene``);
+        tables are never downloaded.
 
         The ``decompress`` parameter specifies whether the provided file is gzip-compressed.
-        This only applies to the situation when the url is given (no decompression is made if fileobj is provided in any case).
-        If decompress is None, data is decompressed if the url ends with .gz, otherwise decompress = True forces decompression.
+        This only applies to the situation when a path is given (no decompression is made if fileobj is an open file).
+        If decompress is None, data is decompressed as it is read if the path ends with .gz, otherwise
+        decompress = True forces decompression.
 
+        If ``lazy`` is True, the rows of the table (a path or an open file) are only grouped by chromosome,
+        and the Transcripts for a chromosome are created the first time that chromosome is accessed.
+
+        ``backend`` is a key of ``TRANSCRIPT_BACKENDS`` selecting the Transcript implementation:
+        'tree' (an IntervalTree per Transcript) or 'array' (binary search over the exon coordinates).
         '''
-        gtree = GenomeIntervalTree()
-        table = UCSCTable(fileobj=fileobj, decompress=decompress)
-        for row in table.data.to_dict(orient='records'):
-            # check if the entry is on a supported chromosome before adding to the tree
-            if row['chrom'] in chromosomes.keys():
-                gtree.addi(row)
+        if lazy:
+            return GenomeIntervalTree._from_table_lazy(fileobj, decompress, backend)
+
+        gtree = GenomeIntervalTree(backend)
+        data = UCSCTable(fileobj=fileobj, decompress=decompress, transcript_fields=True).data
+        # only entries on supported chromosomes are added to the tree
+        data = data[normalize_chroms(data['chrom']).notnull()]
+        for row in data.to_dict(orient='records'):
+            gtree.addi(row)
+
+        return gtree
 
+    @staticmethod
+    def _from_table_lazy(fileobj, decompress, backend):
+        """
+        Groups the rows of the UCSC table fileobj by chromosome, deferring creation of the Transcripts
+        """
+        rows = defaultdict(list)
+        if fileobj is None:
+            fileobj = default_refgene()
+        infile = _open_table(fileobj, decompress) if isinstance(fileobj, basestring) else fileobj
+        try:
+            for line in infile:
+                if line.startswith('#') or not line.strip():
+                    continue
+                row = line.rstrip('\r\n').split('\t')
+                # check if the entry is on a supported chromosome before adding to the tree
+                chrom = normalize_chrom(row[2], None)
+                if chrom is not None:
+                    rows[chrom].append(row)
+        finally:
+            if infile is not fileobj:
+                infile.close()
+
+        gtree = GenomeIntervalTree(backend)
+        for chrom, chrom_rows in rows.items():
+            gtree._pending[chrom] = partial(_build_chrom_tree, chrom_rows, backend)
         return gtree
 
 class SubTranscript(object):
     """Superclass for Exon, Intron, and UTR"""
 
+    # a refGene table holds hundreds of thousands of SubTranscripts, so avoid a __dict__ per instance
+    __slots__ = ('number', 'start', 'end')
+
     def __init__(self, number, start, end):
         self.number = number
         self.start = start
@@ -260,6 +741,8 @@ class SubTranscript(object):
 class Exon(SubTranscript):
     """Helper class to encapsulate an Exon"""
 
+    __slots__ = ('frame', 'cd_start', 'cd_end')
+
     def __init__(self, number, start, end, frame, cd_start=None, cd_end=None):
         """ADD A DOCSTRING"""
         super(Exon, self).__init__(number, start, end)
@@ -295,6 +778,8 @@ class Intron(SubTranscript):
     """
     Helper class to encapsulate an Intron
     """
+    __slots__ = ()
+
     def __init__(self, number, start, end):
         super(Intron, self).__init__(number, start, end)
 
@@ -311,6 +796,8 @@ class UTR(SubTranscript):
     """
     Helper class to encapsulate a UTR
     """
+    __slots__ = ()
+
     def __init__(self, number, start, end):
         super(UTR, self).__init__(number, start, end)
     
@@ -337,6 +824,9 @@ class Transcript(object):
     querying the underlying IntervalTree)
     """
 
+    __slots__ = ('gene', 'id', 'chrom', 'strand', 'tx_start', 'tx_end', 'cd_start', 'cd_end',
+                 'exon_count', 'exon_starts', 'exon_ends', 'exon_frames', '_tree')
+
     def __init__(self, data):
         """
         Creates an instance of a Transcript object from data: a row (pandas Series or dict) from a UCSC RefGene table.
@@ -344,7 +834,7 @@ class Transcript(object):
         # populate fields from data
         self.gene = data['name2']
         self.id = data['name']
-        self.chrom = chromosomes[data['chrom']]
+        self.chrom = normalize_chrom(data['chrom'])
         self.strand = data['strand']
         if self.strand not in ['+', '-']:
             raise ValueError("A transcript must be on the '+' or '-' strand")
@@ -358,58 +848,78 @@ class Transcript(object):
         self.exon_ends = [ int(x) - 1 for x in data['exonEnds'].split(',')[0:-1] ]  # convert end to 0-based, inclusive coordinate
         self.exon_frames = [ int(x) for x in data['exonFrames'].split(',')[0:-1] ]
 
-        # create IntervalTree
-        self.tree = IntervalTree()
+        # the IntervalTree of Exons, UTRs and Introns is only built when the Transcript is first queried
+        self._tree = None
 
-        # add the exons and UTRs
-        for i in range(self.exon_count):
-            exon_start = self.exon_starts[i]
-            exon_end = self.exon_ends[i]
-            exon_frame = self.exon_frames[i]
+    @property
+    def tree(self):
+        """An IntervalTree of the Transcript's Exons, UTRs and Introns, built on first access"""
+        if self._tree is None:
+            self._tree = self._build_tree()
+        return self._tree
 
-            # define exon number based on strand
-            if self.strand == '+':
-                exon_num = i + 1
-            else:
-                exon_num = self.exon_count - i
-
-            # if the exon is split by a UTR, adjust its boundary
-            coding_start = max(exon_start, self.cd_start)
-            coding_end = min(exon_end, self.cd_end)
-
-            # the control statements are written this way (without elifs) to account for single exon transcripts
-            # if the entirety of the exon is non-coding, add a non-coding exon and a UTR
-            if coding_start > exon_end or coding_end < exon_start:
-                self.tree[exon_start : exon_end + 1] = Exon(exon_num, exon_start, exon_end, exon_frame,
-                                                            cd_start=None, cd_end=None)
-                self.tree[exon_start : exon_end + 1] = UTR(exon_num, exon_start, exon_end)
-                continue
-            # otherwise, add a coding exon
-            self.tree[exon_start : exon_end + 1] = Exon(exon_num, exon_start, exon_end, exon_frame,
-                                                           cd_start=coding_start, cd_end=coding_end)
-            # if the start of the exon was adjusted, add a UTR
-            if coding_start > exon_start:
-                self.tree[exon_start : coding_start] = UTR(exon_num, exon_start, coding_start - 1)
-            # if the end of the exon was adjusted, add a coding exon and a UTR
-            if coding_end < exon_end:
-                self.tree[coding_end + 1 : exon_end + 1] = UTR(exon_num, coding_end + 1, exon_end)
-
-                
-        # add the introns
+    def _build_tree(self):
+        """Returns an IntervalTree of the Exons, UTRs and Introns defined by the exon starts, ends and frames"""
+        tree = IntervalTree()
+        for i in range(self.exon_count):
+            for s in self._exon_subtranscripts(i):
+                tree[s.start : s.end + 1] = s
         for i in range(self.exon_count - 1):
-            intron_start = self.exon_ends[i] + 1
-            intron_end = self.exon_starts[i + 1] - 1
+            intron = self._intron(i)
+            if intron is not None:
+                tree[intron.start : intron.end + 1] = intron
+        return tree
+
+    def _exon_subtranscripts(self, i):
+        """Returns a list of the Exon and any UTRs for the i-th exon from tx_start"""
+        exon_start = self.exon_starts[i]
+        exon_end = self.exon_ends[i]
+        exon_frame = self.exon_frames[i]
+
+        # define exon number based on strand
+        if self.strand == '+':
+            exon_num = i + 1
+        else:
+            exon_num = self.exon_count - i
+
+        # if the exon is split by a UTR, adjust its boundary
+        coding_start = max(exon_start, self.cd_start)
+        coding_end = min(exon_end, self.cd_end)
+
+        # the control statements are written this way (without elifs) to account for single exon transcripts
+        # if the entirety of the exon is non-coding, add a non-coding exon and a UTR
+        if coding_start > exon_end or coding_end < exon_start:
+            return [Exon(exon_num, exon_start, exon_end, exon_frame, cd_start=None, cd_end=None),
+                    UTR(exon_num, exon_start, exon_end)]
+        # otherwise, add a coding exon
+        subtranscripts = [Exon(exon_num, exon_start, exon_end, exon_frame, cd_start=coding_start, cd_end=coding_end)]
+        # if the start of the exon was adjusted, add a UTR
+        if coding_start > exon_start:
+            subtranscripts.append(UTR(exon_num, exon_start, coding_start - 1))
+        # if the end of the exon was adjusted, add a UTR
+        if coding_end < exon_end:
+            subtranscripts.append(UTR(exon_num, coding_end + 1, exon_end))
+        return subtranscripts
+
+    def _intron(self, i):
+        """Returns the Intron between the i-th and (i+1)-th exons from tx_start, or None if they are adjacent"""
+        intron_start = self.exon_ends[i] + 1
+        intron_end = self.exon_starts[i + 1] - 1
+
+        # handle edge cases where two exons are adjacent, with no intervening intron (e.g. ZNF274)
+        if intron_start == intron_end + 1:
+            return None
 
-            # handle edge cases where two exons are adjacent, with no intervening intron (e.g. ZNF274)
-            if intron_start == intron_end + 1:
-                continue
+        if self.strand == '+':
+            intron_num = i + 1
+        else:
+            intron_num = self.exon_count - 1 - i
 
-            if self.strand == '+':
-                intron_num = i + 1
-            else:
-                intron_num = self.exon_count - 1 - i
-                
-            self.tree[intron_start : intron_end + 1] = Intron(intron_num, intron_start, intron_end)
+        return Intron(intron_num, intron_start, intron_end)
+
+    def _overlapping(self, start, stop):
+        """Returns a list of every SubTranscript that overlaps [start, stop)"""
+        return [ x[2] for x in self.tree[start:stop] ]
 
     def __str__(self):
         """Returns a string representation of the Transcript in the form '<gene>:<id>'"""
@@ -453,8 +963,7 @@ class Transcript(object):
         NOTE: queries are not inclusive of the upper limit
         """
         start, stop = _check_start_stop(start, stop)
-        intervals = self.tree[start:stop]
-        subtranscripts = [ x[2] for x in intervals ]
+        subtranscripts = self._overlapping(start, stop)
 
         # the reverse_sort flag is used to make sure that exon 01 comes before exon 02 in the annotation
         if self.strand == '+':
@@ -504,8 +1013,7 @@ class Transcript(object):
             stop = self.tx_end
 
         start, stop = _check_start_stop(start, stop)
-        intervals = self.tree[start:stop]
-        exons = [ x[2] for x in intervals if isinstance(x[2], Exon) ]
+        exons = [ x for x in self._overlapping(start, stop) if isinstance(x, Exon) ]
         
         if report_utr:
             exons = [ x for x in exons if x.is_coding(start, stop)]
@@ -524,8 +1032,7 @@ class Transcript(object):
         """
         start, stop = _check_start_stop(start, stop)
 
-        intervals = self.tree[start:stop]
-        subtranscripts = [ x[2] for x in intervals ]
+        subtranscripts = self._overlapping(start, stop)
 
         # if reporting UTR, remove introns and exons that are entrirely encompassed by the UTR within [start, stop)
         if report_utr:
@@ -549,6 +1056,44 @@ class Transcript(object):
         return region_types
 
 
+class ArrayTranscript(Transcript):
+    """
+    A Transcript that answers queries by binary search over compact arrays of its exon starts and ends
+    instead of an IntervalTree.
+
+    Exons within a transcript are sorted and non-overlapping, so the exons overlapping a query are a
+    contiguous run found with bisect, and only the SubTranscripts of those exons (and the introns between
+    them) are created. Annotations are identical to those of a tree-backed Transcript.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, data):
+        super(ArrayTranscript, self).__init__(data)
+        self.exon_starts = array('l', self.exon_starts)
+        self.exon_ends = array('l', self.exon_ends)
+        self.exon_frames = array('l', self.exon_frames)
+
+    def _overlapping(self, start, stop):
+        """Returns a list of every SubTranscript that overlaps [start, stop)"""
+        # exons [first, last) are the only ones with exon_start < stop and exon_end >= start
+        first = bisect_left(self.exon_ends, start)
+        last = bisect_left(self.exon_starts, stop)
+        subtranscripts = []
+        for i in range(first, last):
+            subtranscripts.extend(s for s in self._exon_subtranscripts(i) if s.start < stop and s.end >= start)
+        # intron i follows exon i, so only the introns bordering those exons can overlap
+        for i in range(max(first - 1, 0), min(last, self.exon_count - 1)):
+            intron = self._intron(i)
+            if intron is not None and intron.start < stop and intron.end >= start:
+                subtranscripts.append(intron)
+        return subtranscripts
+
+
+# Transcript implementations, selected with the backend argument of GenomeIntervalTree.from_table
+TRANSCRIPT_BACKENDS = {'tree': Transcript,
+                       'array': ArrayTranscript}
+
 def gene_info_from_transcripts(transcripts, start=None, stop=None):
     """
     Returns an alphabetically-sorted list of strings representing every unique gene
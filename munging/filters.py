@@ -5,12 +5,21 @@ with attributes (dir, fname).
 
 import re
 
+ANALYSIS_PATTERN = re.compile(r'Analysis\.(csv|txt)$')
+
+def combine(*patterns):
+    """
+    Return a single compiled pattern matching any of patterns (strings or
+    compiled patterns), e.g. for utils.walker
+    """
+    return re.compile('|'.join('(?:{})'.format(getattr(p, 'pattern', p)) for p in patterns))
+
 def any_analysis(pth):
     """
     Return True if pth represents an analysis file.
     """
 
-    return bool(re.search(r'Analysis\.(csv|txt)$', pth.fname))
+    return bool(ANALYSIS_PATTERN.search(pth.fname))
 
 def snp_analysis(pth):
     """
@@ -4,388 +4,782 @@ pindel, cnv_exon, cnv_gene, snp, msi, quality, clin_flagged
 """
 import os
 import csv
+import logging
 import re
 import sys
 import copy
-
-from itertools import count, groupby, chain, ifilter , izip_longest
+import cPickle as pickle
+import heapq
+import shutil
+import tempfile
+import multiprocessing
+
+from collections import defaultdict, OrderedDict
+from itertools import count, groupby, chain, ifilter , izip_longest, izip, islice
+import operator
 from operator import itemgetter
 
-from munging import filters
+import numpy as np
+import pandas as pd
+
+from munging import filters, __version__
 from munging.utils import munge_pfx, walker
 
-"""Each function parses a group of sample files for desired information,
-grouping based on the variant_keys list,
+log = logging.getLogger(__name__)
+
+# The parsed results of each sample are cached next to its analysis file
+# by parse_incremental. Increment SAMPLE_CACHE_FORMAT whenever what parse
+# returns changes so that stale caches are re-parsed.
+SAMPLE_CACHE_FORMAT = 1
+
+"""Each summary type is declared by a SummarySpec in SUMMARIES, and
+parsed by parse: a group of sample files is read for the desired
+information, grouping based on the variant_keys list,
 some include additional annotation headers,
 sample counts, and scores calculated based on counts
 """
 
-def parse_quality(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """ Parse the sample quality analysis file, from hs_metrics"""
-    files = filter(filters.quality_analysis, files)
-    variant_keys = ['MEAN_TARGET_COVERAGE']
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            log_pfx=pfx['mini-pfx']
-            prefixes.append(log_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                #Only care about the first line of data, second line is git version, probe data may be after that
-                row1=next(reader)
-                variant = tuple(k for k in variant_keys)
-                specimens[variant][log_pfx] = row1['MEAN_TARGET_COVERAGE']
-                annotation[variant] = specimens[variant]
+class SampleFileIndex(object):
+    """
+    Index of analysis files by sample, built in a single pass over the
+    walked files. The sample of a file is the prefix munge_pfx parses
+    from its name (e.g. 5437_E05_OPXv4_NA12878_MA0013 for
+    5437_E05_OPXv4_NA12878_MA0013.SNP_Analysis.txt).
+    """
 
-    fieldnames = variant_keys + prefixes
+    def __init__(self, files):
+        self.files = list(files)
+        self.by_sample = defaultdict(list)
+        for pth in self.files:
+            self.by_sample[sample_pfx(pth.fname)].append(pth)
+
+    def find(self, sample, predicate=None):
+        """
+        Return the files of sample, in walk order, for which predicate
+        (e.g. filters.snp_analysis) is True.
+        """
+        if sample in self.by_sample:
+            found = self.by_sample[sample]
+        else:
+            # sample is not a whole file prefix, fall back to matching part of the file name
+            found = [pth for pth in self.files if sample in pth.fname]
+        if predicate is not None:
+            found = filter(predicate, found)
+        return found
+
+def sample_pfx(fname):
+    """
+    Return the sample prefix munge_pfx parses from fname, or the part of
+    fname before the first '.' if munge_pfx cannot parse it
+    """
+    pfx = fname.split('.')[0]
+    # munge_pfx prints the names it rejects, so only give it ones it parses
+    if len(pfx.split('_')) > 5:
+        return pfx
+    try:
+        return munge_pfx(pfx)['pfx']
+    except IndexError:
+        # a library-version of no known assay
+        return pfx
+
+def sample_file_index(files):
+    """Return files as a SampleFileIndex, indexing them if they are not already"""
+    if isinstance(files, SampleFileIndex):
+        return files
+    return SampleFileIndex(files)
+
+def count_samples(specimens):
+    """Set 'Count' for each variant in specimens to the number of samples it was found in"""
+    for key, value in specimens.iteritems():
+        specimens[key]['Count']=len(value)
 
-    return specimens, annotation, prefixes, fieldnames, variant_keys 
+def count_covered(specimens, threshold=250):
+    """Set 'Count' for each region in specimens to the number of samples covered to at least threshold"""
+    for region, sample_data in specimens.iteritems():
+        total=0
+        for s in sample_data.values():
+            if float(s)>=threshold:
+                total+=1
+        specimens[region]['Count']=total
 
-def parse_clin_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the Genotype output, which is the reads of clin_flagged found"""
-    files = filter(filters.genotype_analysis, files)
-    variant_keys = ['Position','Ref_Base','Var_Base' ]
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            reads_pfx=pfx['mini-pfx']+'_Variants'
-            prefixes.append(reads_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][reads_pfx]=row['Variant_Reads']
-                    annotation[variant] = row
+def count_samples_frame(samples):
+    """Columnar count_samples: the number of samples reported in each row of the samples DataFrame"""
+    return samples.notnull().sum(axis=1)
 
-    annotation_headers = ['Clinically_Flagged']
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
+def count_covered_frame(samples, threshold=250):
+    """Columnar count_covered: the number of samples in each row of samples covered to at least threshold"""
+    return samples.apply(lambda s: pd.to_numeric(s) >= threshold).sum(axis=1)
 
-def parse_msi_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the Genotype output, which is the reads of clin_flagged found"""
-    files = filter(filters.genotype_analysis, files)
-    variant_keys = ['Position','Ref_Base','Var_Base' ]
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            reads_pfx=pfx['mini-pfx']+'_Variants|Total'
-            status_pfx=pfx['mini-pfx']+'_Status'
-            prefixes.append(reads_pfx)
-            prefixes.append(status_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    try:
-                        frac = "{0:.4f}".format(float(row['Variant_Reads'])/float(row['Valid_Reads']))
-                    except ZeroDivisionError:
-                        frac = '0'
-                    specimens[variant][reads_pfx]=row['Variant_Reads']+'|'+row['Valid_Reads']
-                    if int(row['Valid_Reads']) >= 100:
-                        if float(frac) >= 0.02:
-                            specimens[variant][status_pfx]='POS'
-                        elif float(frac) <= 0.01:
-                            specimens[variant][status_pfx]='NEG'
-                        elif 0.01 < float(frac) < 0.02 :
-                            specimens[variant][status_pfx]='IND'
-                    else:
-                        specimens[variant][status_pfx]='REVIEW'
-                    annotation[variant] = row
-    annotation_headers = ['Clinically_Flagged']
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
+count_samples.frame = count_samples_frame
+count_covered.frame = count_covered_frame
 
-def parse_hotspot_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the Genotype output, which is the reads of clin_flagged found"""
-    files = filter(filters.genotype_analysis, files)
-    variant_keys = ['Position','Ref_Base','Var_Base' ]
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            reads_pfx=pfx['mini-pfx']+'_Variants|Total'
-            status_pfx=pfx['mini-pfx']+'_Status'
-            vaf_pfx=pfx['mini-pfx']+'_VAF'
-            prefixes.append(reads_pfx)
-            prefixes.append(vaf_pfx)
-            prefixes.append(status_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    #Skip lines with no read info
-                    if not row['Variant_Reads'] and not row['Valid_Reads']:
-                        continue
-                    try:
-                        frac = "{0:.4f}".format(float(row['Variant_Reads'])/float(row['Valid_Reads']))
-                    except ZeroDivisionError:
-                        frac = '0'
-                    specimens[variant][reads_pfx]=row['Variant_Reads']+'|'+row['Valid_Reads']
-                    specimens[variant][vaf_pfx]=frac
-                    if int(row['Valid_Reads']) >= 50:
-                        if float(frac) > 0.70:
-                            specimens[variant][status_pfx]='HOMO'
-                        elif float(frac) <= 0.10:
-                            specimens[variant][status_pfx]='NEG'
-                        elif 0.20 <= float(frac) <= 0.70 :
-                            specimens[variant][status_pfx]='HET'
-                        else:
-                            specimens[variant][status_pfx]='REVIEW'                    
-                    else:
-                        specimens[variant][status_pfx]='REVIEW'
-                    annotation[variant] = row
-    annotation_headers = ['Clinically_Flagged']
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
+class SummarySpec(object):
+    """
+    Declaration of a top level summary, built from one analysis file per sample.
+
+    file_filter -- predicate from munging.filters selecting each sample's analysis file,
+      or None to use any of the sample's files
+    variant_keys -- columns of the analysis files identifying a row of the summary
+    annotation_headers -- columns of the analysis files reported once per row of the summary,
+      from the last sample's row; only these columns of the row are kept
+    columns -- names of the columns reported for each sample, formatted with its mini-pfx
+    values -- function of a row of an analysis file, returning the values of the sample's
+      columns (None for a value that is not reported), or None to skip the row.
+      Its .frame attribute is the columnar version used by parse_frame: a function of
+      the DataFrame of an analysis file, returning a Series for each column, indexed
+      by the rows that are not skipped.
+    count -- function adding a 'Count' to each row of the merged specimens, or None.
+      Its .frame attribute returns the counts of a DataFrame of sample columns.
+    single_row -- the analysis files hold a single row of data, reported under the
+      variant_keys themselves
+    """
 
-def parse_glt_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the Genotype output, which is the reads of clin_flagged found"""
+    def __init__(self, file_filter, variant_keys, columns, values, annotation_headers=(),
+                 count=None, single_row=False):
+        self.file_filter = file_filter
+        self.variant_keys = list(variant_keys)
+        self.columns = list(columns)
+        self.values = values
+        self.annotation_headers = list(annotation_headers)
+        self.count = count
+        self.single_row = single_row
+
+    def projector(self, fieldnames):
+        """
+        Return a function projecting the rows of an analysis file with
+        fieldnames to its annotation_headers, the only annotation columns
+        written. Values are interned: gene names, transcripts and the like
+        repeat across variants and samples.
+        """
+        headers = [h for h in self.annotation_headers if h in fieldnames]
+        if not headers:
+            return lambda row: {}
+        elif len(headers) == 1:
+            header, = headers
+            return lambda row: {header: _intern(row[header])}
+        getter = itemgetter(*headers)
+        def project(row):
+            try:
+                return dict(izip(headers, map(intern, getter(row))))
+            except TypeError:
+                #short rows are missing values
+                return {h: _intern(row[h]) for h in headers}
+        return project
+
+def _intern(value):
+    return intern(value) if type(value) is str else value
+
+def column(name):
+    """Return a values function reporting column name of each row"""
+    values = lambda row: [row[name]]
+    values.frame = lambda data: [data[name]]
+    return values
+
+def vaf(row):
+    """Return the variant allele fraction of a genotype row, formatted as reported"""
+    try:
+        return "{0:.4f}".format(float(row['Variant_Reads'])/float(row['Valid_Reads']))
+    except ZeroDivisionError:
+        return '0'
+
+class GenotypeStatus(object):
+    """
+    Status calling of the sites of a genotype assay from their formatted VAF and Valid_Reads.
 
-    files = filter(filters.genotype_analysis, files)
-    variant_keys = ['Position','Ref_Base','Var_Base' ]
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            reads_pfx=pfx['mini-pfx']+' Variants|Total|VAF'
-            #vaf_pfx=pfx['mini-pfx']+' VAF'
-            status_pfx=pfx['mini-pfx']+' Status'
-            prefixes.append(reads_pfx)
-            #prefixes.append(vaf_pfx)
-            prefixes.append(status_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    #Skip lines with no read info
-                    if not row['Variant_Reads'] and not row['Valid_Reads']:
-                        continue
-                    try:
-                        frac = "{0:.4f}".format(float(row['Variant_Reads'])/float(row['Valid_Reads']))
-                    except ZeroDivisionError:
-                        frac = '0'
-                    specimens[variant][reads_pfx]=row['Variant_Reads']+' | '+row['Valid_Reads']+' | '+frac
-                    #specimens[variant][vaf_pfx]=frac
-                    if int(row['Valid_Reads']) >= 100:
-                        if float(frac) >= 0.95:
-                            specimens[variant][status_pfx]='HOMO'
-                        elif float(frac) <= 0.02:
-                            specimens[variant][status_pfx]='NEG'
-                        elif 0.40 <= float(frac) <= 0.58 :
-                            specimens[variant][status_pfx]='HET'
-                        else:
-                            specimens[variant][status_pfx]='REVIEW'                    
-                    else:
-                        specimens[variant][status_pfx]='REVIEW'
-                    annotation[variant] = row
-    annotation_headers = ['Clinically_Flagged']
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
+    min_reads -- sites with fewer Valid_Reads are called 'REVIEW'
+    rules -- (status, tests) pairs, checked in order: a site is called status
+      when its VAF passes every (op, threshold) test in tests, i.e. op(vaf, threshold)
+    default -- the status of sites with enough reads that pass no rule
+    """
 
-def parse_pindel(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the pindel analysis file, give total counts of samples with site"""
+    def __init__(self, min_reads, rules, default='REVIEW'):
+        self.min_reads = min_reads
+        self.rules = rules
+        self.default = default
+
+    def __call__(self, frac, valid_reads):
+        """Return the status of a single site"""
+        if int(valid_reads) < self.min_reads:
+            return 'REVIEW'
+        frac = float(frac)
+        for status, tests in self.rules:
+            if all(op(frac, threshold) for op, threshold in tests):
+                return status
+        return self.default
+
+    def frame(self, frac, valid_reads):
+        """Return the status of each site as a Series, given Series of their formatted VAFs and Valid_Reads"""
+        frac = frac.astype(float).values
+        conditions = [valid_reads.astype(float).values < self.min_reads]
+        for status, tests in self.rules:
+            passed = np.ones(len(frac), dtype=bool)
+            for op, threshold in tests:
+                passed &= op(frac, threshold)
+            conditions.append(passed)
+        statuses = np.select(conditions, ['REVIEW'] + [status for status, tests in self.rules],
+                             default=self.default).astype(object)
+        return pd.Series(statuses, index=valid_reads.index, dtype=object)
+
+#Status calling of each genotype assay
+GENOTYPE_STATUS = {
+    'msi': GenotypeStatus(100, [('POS', [(operator.ge, 0.02)]),
+                                ('NEG', [(operator.le, 0.01)]),
+                                ('IND', [(operator.gt, 0.01), (operator.lt, 0.02)])],
+                          default=None),
+    'hotspot': GenotypeStatus(50, [('HOMO', [(operator.gt, 0.70)]),
+                                   ('NEG', [(operator.le, 0.10)]),
+                                   ('HET', [(operator.ge, 0.20), (operator.le, 0.70)])]),
+    'glt': GenotypeStatus(100, [('HOMO', [(operator.ge, 0.95)]),
+                                ('NEG', [(operator.le, 0.02)]),
+                                ('HET', [(operator.ge, 0.40), (operator.le, 0.58)])]),
+}
+msi_status = GENOTYPE_STATUS['msi']
+hotspot_status = GENOTYPE_STATUS['hotspot']
+glt_status = GENOTYPE_STATUS['glt']
+
+def msi_values(row):
+    frac = vaf(row)
+    return [row['Variant_Reads']+'|'+row['Valid_Reads'], msi_status(frac, row['Valid_Reads'])]
+
+def hotspot_values(row):
+    #Skip lines with no read info
+    if not row['Variant_Reads'] and not row['Valid_Reads']:
+        return None
+    frac = vaf(row)
+    return [row['Variant_Reads']+'|'+row['Valid_Reads'], frac, hotspot_status(frac, row['Valid_Reads'])]
+
+def glt_values(row):
+    #Skip lines with no read info
+    if not row['Variant_Reads'] and not row['Valid_Reads']:
+        return None
+    frac = vaf(row)
+    return [row['Variant_Reads']+' | '+row['Valid_Reads']+' | '+frac, glt_status(frac, row['Valid_Reads'])]
+
+def pindel_values(row):
+    #Report the Reads found, from whichever aligner found more
+    try:
+        return [max(row['bbmergedReads'], row['bwamemReads'])]
+    except KeyError:
+        return [row['Reads']]
+
+def snp_values(row):
+    return [row['Ref_Reads']+'|'+row['Var_Reads']]
+
+def vaf_frame(data):
+    """Columnar vaf: the formatted variant allele fraction of each row of a genotype DataFrame"""
+    valid = data['Valid_Reads'].astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = data['Variant_Reads'].astype(float).values / valid.values
+    frac = pd.Series(np.char.mod('%.4f', frac), index=data.index, dtype=object)
+    return frac.where(valid != 0, '0')
+
+def msi_frame(data):
+    frac = vaf_frame(data)
+    return [data['Variant_Reads']+'|'+data['Valid_Reads'], msi_status.frame(frac, data['Valid_Reads'])]
+
+def _with_reads(data):
+    """The rows of a genotype DataFrame with read info"""
+    return data[(data['Variant_Reads'] != '') | (data['Valid_Reads'] != '')]
+
+def hotspot_frame(data):
+    data = _with_reads(data)
+    frac = vaf_frame(data)
+    return [data['Variant_Reads']+'|'+data['Valid_Reads'], frac,
+            hotspot_status.frame(frac, data['Valid_Reads'])]
+
+def glt_frame(data):
+    data = _with_reads(data)
+    frac = vaf_frame(data)
+    return [data['Variant_Reads']+' | '+data['Valid_Reads']+' | '+frac,
+            glt_status.frame(frac, data['Valid_Reads'])]
+
+def pindel_frame(data):
+    if 'bbmergedReads' in data and 'bwamemReads' in data:
+        return [data['bbmergedReads'].where(~(data['bwamemReads'] > data['bbmergedReads']), data['bwamemReads'])]
+    return [data['Reads']]
+
+def snp_frame(data):
+    return [data['Ref_Reads']+'|'+data['Var_Reads']]
+
+msi_values.frame = msi_frame
+hotspot_values.frame = hotspot_frame
+glt_values.frame = glt_frame
+pindel_values.frame = pindel_frame
+snp_values.frame = snp_frame
+
+GENOTYPE_KEYS = ['Position','Ref_Base','Var_Base']
+SNP_ANNOTATION = [
+    'Gene',
+    'Variant_Type',
+    'Transcripts',
+    'Clinically_Flagged',
+    'Cosmic',
+    'Segdup',
+    'Polyphen',
+    'Sift',
+    'Mutation_Taster',
+    'Gerp',
+    'UW_Freq',
+    'UW_Count',
+    'UW_DEC_p',
+    '1000g_ALL',
+    'EVS_esp6500_ALL',
+    '1000g_AMR',
+    'EVS_esp6500_AA',
+    '1000g_EUR',
+    'EVS_esp6500_EU',
+    '1000g_SAS',
+    '1000g_EAS',
+    '1000g_AFR',
+    'ADA_Alter_Splice',
+    'RF_Alter_Splice',
+    'mutalyzer_errors'
+]
 
-    files = filter(filters.pindel_analysis, files)
-    variant_keys = ['Position', 'Gene', 'Size']
-    #Other annotation to keep 
-    annotation_headers = [
-        'Gene_Region',
-        'Event_Type',
-        'Transcripts'
-        ]
+#Every top level summary, by the type given to create_top_level_summary
+SUMMARIES = {
+    'quality': SummarySpec(filters.quality_analysis, ['MEAN_TARGET_COVERAGE'], ['{}'],
+                           column('MEAN_TARGET_COVERAGE'), single_row=True),
+    'clin_flagged': SummarySpec(filters.genotype_analysis, GENOTYPE_KEYS, ['{}_Variants'],
+                                column('Variant_Reads'), ['Clinically_Flagged']),
+    'msi_flagged': SummarySpec(filters.genotype_analysis, GENOTYPE_KEYS, ['{}_Variants|Total', '{}_Status'],
+                               msi_values, ['Clinically_Flagged']),
+    'hotspot_flagged': SummarySpec(filters.genotype_analysis, GENOTYPE_KEYS,
+                                   ['{}_Variants|Total', '{}_VAF', '{}_Status'],
+                                   hotspot_values, ['Clinically_Flagged']),
+    'glt_flagged': SummarySpec(filters.genotype_analysis, GENOTYPE_KEYS, ['{} Variants|Total|VAF', '{} Status'],
+                               glt_values, ['Clinically_Flagged']),
+    'pindel': SummarySpec(filters.pindel_analysis, ['Position', 'Gene', 'Size'], ['{}'],
+                          pindel_values, ['Gene_Region', 'Event_Type', 'Transcripts'], count=count_samples),
+    'breakdancer': SummarySpec(filters.breakdancer_analysis, ['Event_1', 'Event_2'], ['{}'],
+                               column('num_Reads'), ['Type', 'Size', 'Gene_1', 'Gene_2'], count=count_samples),
+    'snp': SummarySpec(filters.snp_analysis, GENOTYPE_KEYS, ['{}_Ref|Var'],
+                       snp_values, SNP_ANNOTATION, count=count_samples),
+    'cnv_exon': SummarySpec(filters.cnv_exon_analysis, ['Position', 'Gene'], ['{}_Log'],
+                            column('Ave_Adjusted_Log_Ratio'), ['Transcripts']),
+    'cnv_gene': SummarySpec(filters.cnv_gene_analysis, ['Position', 'Gene'], ['{}_Log'],
+                            column('Ave_Adjusted_Log_Ratio'), ['Transcripts']),
+    'annotsv': SummarySpec(filters.annotsv_analysis, ['Event1', 'Event2'], ['{}'],
+                           column('QUAL'),
+                           ['Gene1', 'Gene2', 'location1', 'location2', 'NM', '1000g_event', '1000g_max_AF',
+                            'Repeats1', 'Repeats2', 'DGV_GAIN_found|tested', 'DGV_LOSS_found|tested'],
+                           count=count_samples),
+    'amplicon': SummarySpec(filters.amplicon_analysis, ['Position', 'Probe'], ['{}'],
+                            column('MeanCoverage')),
+    'coveragekit': SummarySpec(None, ['RegionID'], ['{}_AveCoverage'],
+                               column('AverageCoverage'), ['Position'], count=count_covered),
+}
+SUMMARIES['indel'] = SUMMARIES['snp']
+SUMMARIES['exon_cov'] = SummarySpec(filters.exon_coverage_analysis, ['RegionID'], ['{}_AveCoverage'],
+                                    column('AverageCoverage'), ['Position'], count=count_covered)
+SUMMARIES['gene_cov'] = SummarySpec(filters.gene_coverage_analysis, ['RegionID'], ['{}_AveCoverage'],
+                                    column('AverageCoverage'), ['Position'], count=count_covered)
+
+def parse(summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """
+    Parse the file of each sample in sort_order for the summary_type in SUMMARIES,
+    returning specimens, annotation, prefixes, fieldnames, variant_keys
+    """
+    spec = SUMMARIES[summary_type]
+    files = sample_file_index(files)
+    variant_keys = list(spec.variant_keys)
     for sample in sort_order:
         #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            prefixes.append(pfx['mini-pfx'])
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
+        pfx_file = files.find(sample, spec.file_filter)
+        if not pfx_file:
+            continue
+        pfx_file = pfx_file[0]
+        pfx = munge_pfx(pfx_file.fname)
+        #Create a smaller version of this really long string
+        columns = [c.format(pfx['mini-pfx']) for c in spec.columns]
+        prefixes.extend(columns)
+        with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
+            reader = csv.DictReader(fname, delimiter='\t')
+            project = spec.projector(reader.fieldnames)
+            if spec.single_row:
+                #Only care about the first line of data, second line is git version, probe data may be after that
+                reader = [next(reader)]
+            for row in reader:
+                values = spec.values(row)
+                if values is None:
+                    continue
+                if spec.single_row:
+                    variant = tuple(variant_keys)
+                else:
                     variant = tuple(row[k] for k in variant_keys)
-                    #Update the specimen dict for this variant, for this pfx, report the Reads found
-                    try:
-                        specimens[variant][pfx['mini-pfx']] = max(row['bbmergedReads'], row['bwamemReads'])
-                    except KeyError:
-                        specimens[variant][pfx['mini-pfx']] = row['Reads']
-                    annotation[variant] = row
-
-    #Update the specimen dict for this variant, count samples present
-    for key, value in specimens.iteritems():
-        specimens[key]['Count']=len(value)
+                for col, value in zip(columns, values):
+                    if value is not None:
+                        specimens[variant][col] = value
+                annotation[variant] = specimens[variant] if spec.single_row else project(row)
+
+    if spec.count:
+        #Update the specimen dict for this variant, add 'Count' to prefixes for correct dict zipping/printing
+        spec.count(specimens)
+        prefixes.append('Count')
+    fieldnames = variant_keys + spec.annotation_headers + prefixes
+    return specimens, annotation, prefixes, fieldnames, variant_keys
+
+def _parse_sample(args):
+    """Parse the files of a single sample for summary_type, in a parse_parallel worker"""
+    summary_type, files, sample = args
+    specimens, annotation, prefixes, fieldnames, variant_keys = parse(
+        summary_type, files, defaultdict(dict), {}, [], [], [sample])
+    return dict(specimens), annotation, prefixes, fieldnames, variant_keys
 
-    #Add 'Count' to prefixes for correct dict zipping/printing    
-    prefixes.append('Count')
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
+def parse_parallel(summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order, jobs):
+    """
+    Parse each sample in sort_order for summary_type in a pool of jobs
+    processes, then merge the per-sample results in sort_order, as
+    parse would have produced them serially.
+    """
+    spec = SUMMARIES[summary_type]
+    files = sample_file_index(files)
+    if not sort_order:
+        return parse(summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order)
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        results = pool.map(_parse_sample, [(summary_type, files.find(sample), sample) for sample in sort_order],
+                           chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    return merge_samples(summary_type, results, specimens, annotation, prefixes)
+
+def merge_samples(summary_type, results, specimens, annotation, prefixes):
+    """
+    Merge the results of parsing one sample at a time for summary_type,
+    in order, as parse would have produced them for all of the samples.
+    Returns specimens, annotation, prefixes, fieldnames, variant_keys.
+    """
+    spec = SUMMARIES[summary_type]
+    for sample_specimens, sample_annotation, sample_prefixes, fieldnames, variant_keys in results:
+        #Counts are recomputed over all samples once they are merged
+        if spec.count:
+            sample_prefixes = sample_prefixes[:-1]
+        for variant, value in sample_specimens.iteritems():
+            if spec.count:
+                value = {k: v for k, v in value.iteritems() if k != 'Count'}
+            specimens[variant].update(value)
+        for variant, row in sample_annotation.iteritems():
+            #single_row summaries annotate with the specimen dict itself, which survives pickling
+            annotation[variant] = specimens[variant] if row is sample_specimens.get(variant) else row
+        prefixes.extend(sample_prefixes)
+
+    if spec.count:
+        spec.count(specimens)
+        prefixes.append('Count')
+    variant_keys = list(spec.variant_keys)
+    fieldnames = variant_keys + spec.annotation_headers + prefixes
+    return specimens, annotation, prefixes, fieldnames, variant_keys
 
+def sample_cache_path(path, summary_type):
+    """Return the path of the cached summary_type results for the analysis file at path"""
+    return '{}.{}.cache'.format(path, summary_type)
 
-def parse_breakdancer(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the breakdancer analysis file, give total counts of samples with site"""
+def _sample_cache_key(path, summary_type):
+    stat = os.stat(path)
+    return [summary_type, stat.st_size, stat.st_mtime, SAMPLE_CACHE_FORMAT, __version__]
 
-    files = filter(filters.breakdancer_analysis, files)
-    variant_keys = ['Event_1', 'Event_2']
-    #Other annotation to keep 
-    annotation_headers = [
-        'Type',
-        'Size',
-        'Gene_1',
-        'Gene_2'
-        ]
+def load_sample_cache(path, summary_type):
+    """
+    Return the cached summary_type results for the analysis file at path,
+    or None if there are none or the file has changed since they were cached
+    """
+    try:
+        with open(sample_cache_path(path, summary_type), 'rb') as f:
+            key, result = pickle.load(f)
+    except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if key != _sample_cache_key(path, summary_type):
+        return None
+    return result
+
+def save_sample_cache(path, summary_type, result):
+    """
+    Cache the summary_type results for the analysis file at path next to
+    it. The cache is written to a temporary file and renamed into place,
+    so concurrent readers never see a partially written cache.
+    """
+    cache = sample_cache_path(path, summary_type)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache), suffix='.tmp')
+    except OSError, e:
+        log.warning('not caching {}: {}'.format(cache, e))
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((_sample_cache_key(path, summary_type), result), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, cache)
+    except:
+        os.remove(tmp)
+        raise
+
+def parse_incremental(summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order, jobs=1):
+    """
+    Version of parse_parallel for re-running a summary after some samples
+    change: the results of each sample are cached next to its analysis
+    file, keyed by the file's size and mtime, and only samples without
+    an up to date cache are parsed again, in a pool of jobs processes if
+    jobs > 1. The results are then merged in sort_order.
+    """
+    spec = SUMMARIES[summary_type]
+    files = sample_file_index(files)
+    results = {}
+    stale = []
+    for sample in sort_order:
+        pfx_file = files.find(sample, spec.file_filter)
+        if not pfx_file:
+            continue
+        path = os.path.join(pfx_file[0].dir, pfx_file[0].fname)
+        results[sample] = load_sample_cache(path, summary_type)
+        if results[sample] is None:
+            stale.append((sample, path, pfx_file[:1]))
+    log.info('{} of {} samples cached'.format(len(results) - len(stale), len(results)))
+
+    tasks = [(summary_type, sample_files, sample) for sample, path, sample_files in stale]
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            parsed = pool.map(_parse_sample, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        parsed = map(_parse_sample, tasks)
+    for (sample, path, sample_files), result in izip(stale, parsed):
+        save_sample_cache(path, summary_type, result)
+        results[sample] = result
+
+    return merge_samples(summary_type, [results[sample] for sample in sort_order if sample in results],
+                         specimens, annotation, prefixes)
+
+def read_analysis(path):
+    """Read an analysis file into a DataFrame of strings, exactly as written"""
+    return pd.read_csv(path, sep='\t', dtype=str, na_filter=False)
+
+def _variant_index(arrays, variant_keys):
+    """Index the variants given by the arrays of each of the variant_keys"""
+    if len(variant_keys) == 1:
+        return pd.Index(arrays[0], name=variant_keys[0], dtype=object)
+    return pd.MultiIndex.from_arrays(arrays, names=variant_keys)
+
+def parse_frame(summary_type, files, sort_order):
+    """
+    Columnar version of parse: each sample's file for summary_type is
+    read into a DataFrame, its columns outer joined with the other
+    samples' on the variant_keys, and Count computed over the joined
+    columns. Returns the summary as a DataFrame of the fieldnames, with
+    one row per variant in the order parse reports them, and the
+    fieldnames.
+    """
+    spec = SUMMARIES[summary_type]
+    files = sample_file_index(files)
+    variant_keys = list(spec.variant_keys)
+    prefixes = []
+    samples = OrderedDict()
+    annotations = []
     for sample in sort_order:
         #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            prefixes.append(pfx['mini-pfx'])
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    #Update the specimen dict for this variant, for this pfx, report the num_Reads found
-                    specimens[variant][pfx['mini-pfx']] = row['num_Reads']
-                    annotation[variant] = row
-
-    #Update the specimen dict for this variant, count samples present
-    for key, value in specimens.iteritems():
-        specimens[key]['Count']=len(value)
+        pfx_file = files.find(sample, spec.file_filter)
+        if not pfx_file:
+            continue
+        pfx_file = pfx_file[0]
+        pfx = munge_pfx(pfx_file.fname)
+        columns = [c.format(pfx['mini-pfx']) for c in spec.columns]
+        prefixes.extend(columns)
+        data = read_analysis(os.path.join(pfx_file.dir, pfx_file.fname))
+        if spec.single_row:
+            #Only care about the first line of data, second line is git version, probe data may be after that
+            data = data.iloc[:1]
+        values = spec.values.frame(data)
+        rows = data.loc[values[0].index]
+        if spec.single_row:
+            index = _variant_index([[k] * len(rows) for k in variant_keys], variant_keys)
+        else:
+            index = _variant_index([rows[k].values for k in variant_keys], variant_keys)
+        #Later rows for the same variant win, as they do in parse
+        keep = ~index.duplicated(keep='last')
+        for col, value in zip(columns, values):
+            value = pd.Series(value.values[keep], index=index[keep], name=col)
+            samples[col] = value.combine_first(samples[col]) if col in samples else value
+        if spec.annotation_headers:
+            annotations.append(rows.reindex(columns=spec.annotation_headers, fill_value='').set_index(index)[keep])
+
+    if samples:
+        #the variants are sorted below, so only the sample column order need be kept
+        summary = pd.DataFrame(samples, columns=samples.keys())
+    else:
+        summary = pd.DataFrame(columns=prefixes, index=_variant_index([[] for k in variant_keys], variant_keys))
+    if spec.count:
+        summary['Count'] = spec.count.frame(summary[samples.keys()])
+        prefixes.append('Count')
+    if annotations:
+        annotation = pd.concat(annotations)
+        summary = summary.join(annotation[~annotation.index.duplicated(keep='last')])
+    summary = summary.reindex(sorted(summary.index))
+    summary.index.names = variant_keys
+    fieldnames = variant_keys + spec.annotation_headers + prefixes
+    return summary.reset_index().reindex(columns=fieldnames), fieldnames
+
+def sorted_rows(path, sort_key, tmpdir):
+    """
+    Iterate over (sort_key(row), line number, row) for the rows of the
+    analysis file at path, in sort_key order. Files already in order are
+    streamed; others are sorted once into a temporary file in tmpdir.
+    """
+    with open(path) as f:
+        reader = csv.DictReader(f, delimiter='\t')
+        previous = None
+        in_order = True
+        for row in reader:
+            key = sort_key(row)
+            if previous is not None and key < previous:
+                in_order = False
+                break
+            previous = key
+        if not in_order:
+            f.seek(0)
+            reader = csv.DictReader(f, delimiter='\t')
+            rows = sorted(reader, key=sort_key)
+            fd, path = tempfile.mkstemp(dir=tmpdir, suffix='.txt')
+            with os.fdopen(fd, 'w') as out:
+                writer = csv.DictWriter(out, fieldnames=reader.fieldnames, delimiter='\t')
+                writer.writeheader()
+                writer.writerows(rows)
+            del rows
+
+    with open(path) as f:
+        for lineno, row in enumerate(csv.DictReader(f, delimiter='\t')):
+            yield sort_key(row), lineno, row
+
+def _tagged_rows(rows, i, columns):
+    """Tag the (variant, line number, row) of the i-th sample with its columns, for merging"""
+    for variant, lineno, row in rows:
+        yield variant, i, lineno, columns, row
+
+def _stream_rows(spec, sources, prefixes):
+    """Merge the rows of the sources of parse_stream, yielding each row of the summary"""
+    variant_keys = spec.variant_keys
+    if spec.single_row:
+        variant_of = lambda row: tuple(variant_keys)
+    else:
+        variant_of = lambda row: tuple(row[k] for k in variant_keys)
+    tmpdir = tempfile.mkdtemp(prefix='munge-')
+    try:
+        streams = []
+        for i, (columns, path) in enumerate(sources):
+            rows = sorted_rows(path, variant_of, tmpdir)
+            if spec.single_row:
+                #Only care about the first line of data, second line is git version, probe data may be after that
+                rows = islice(rows, 1)
+            streams.append(_tagged_rows(rows, i, columns))
+
+        #Rows of the same variant are merged in sample order, then line order, as parse reads them
+        for variant, group in groupby(heapq.merge(*streams), itemgetter(0)):
+            specimen = {}
+            annotation = None
+            for _, _, _, columns, row in group:
+                values = spec.values(row)
+                if values is None:
+                    continue
+                for col, value in zip(columns, values):
+                    if value is not None:
+                        specimen[col] = value
+                annotation = specimen if spec.single_row else row
+            if annotation is None or not (specimen or spec.single_row):
+                continue
+            if spec.count:
+                spec.count({variant: specimen})
+            d = dict(zip(variant_keys, variant))
+            d.update((pfx, specimen.get(pfx)) for pfx in prefixes)
+            d.update(annotation if spec.single_row else
+                     ((h, annotation[h]) for h in spec.annotation_headers if h in annotation))
+            yield d
+    finally:
+        shutil.rmtree(tmpdir)
+
+def parse_stream(summary_type, files, sort_order):
+    """
+    Streaming version of parse, for summaries too large to hold in
+    memory: each sample's file for summary_type is read in variant_keys
+    order, and the files are merged a variant at a time, so only the
+    rows of the current variant are kept. Returns the fieldnames and an
+    iterator over the rows of the summary, in the order parse reports
+    them, as dicts for a csv.DictWriter.
+    """
+    spec = SUMMARIES[summary_type]
+    files = sample_file_index(files)
+    prefixes = []
+    sources = []
+    for sample in sort_order:
+        #Grab the file for each sample, in specified sort order
+        pfx_file = files.find(sample, spec.file_filter)
+        if not pfx_file:
+            continue
+        pfx_file = pfx_file[0]
+        pfx = munge_pfx(pfx_file.fname)
+        columns = [c.format(pfx['mini-pfx']) for c in spec.columns]
+        prefixes.extend(columns)
+        sources.append((columns, os.path.join(pfx_file.dir, pfx_file.fname)))
+    if spec.count:
+        prefixes.append('Count')
+    fieldnames = spec.variant_keys + spec.annotation_headers + prefixes
+    return fieldnames, _stream_rows(spec, sources, prefixes)
+
+#The parsers of each summary type by name, as used before SUMMARIES
+def parse_quality(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the sample quality analysis file, from hs_metrics"""
+    return parse('quality', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-    #Add 'Count' to prefixes for correct dict zipping/printing    
-    prefixes.append('Count')
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys 
+def parse_clin_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the Genotype output, which is the reads of clin_flagged found"""
+    return parse('clin_flagged', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
+def parse_msi_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the Genotype output, with the MSI status of each site"""
+    return parse('msi_flagged', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-def parse_snp(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the snp output file, give ref|var read counts per sample"""
-    files = filter(filters.snp_analysis, files)
-    variant_keys = ['Position', 'Ref_Base', 'Var_Base']
-    annotation_headers = [
-        'Gene',
-        'Variant_Type',
-        'Transcripts',
-        'Clinically_Flagged',
-        'Cosmic',
-        'Segdup',
-        'Polyphen',
-        'Sift',
-        'Mutation_Taster',
-        'Gerp',
-        'UW_Freq',
-        'UW_Count',
-        'UW_DEC_p',
-        '1000g_ALL',
-        'EVS_esp6500_ALL',
-        '1000g_AMR',
-        'EVS_esp6500_AA',
-        '1000g_EUR',
-        'EVS_esp6500_EU',
-        '1000g_SAS',
-        '1000g_EAS',
-        '1000g_AFR',
-        'ADA_Alter_Splice',
-        'RF_Alter_Splice',
-        'mutalyzer_errors'
-]
+def parse_hotspot_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the Genotype output, with the VAF and genotype of each hotspot"""
+    return parse('hotspot_flagged', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            reads_pfx=pfx['mini-pfx']+'_Ref|Var'
-            prefixes.append(reads_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][reads_pfx] = row['Ref_Reads']+'|'+row['Var_Reads']
-                    annotation[variant] = row
+def parse_glt_flagged(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the Genotype output, with the VAF and genotype of each GLT site"""
+    return parse('glt_flagged', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-    #Update the specimen dict for this variant, count samples present
-    for key, value in specimens.iteritems():
-        specimens[key]['Count']=len(value)
+def parse_pindel(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the pindel analysis file, give total counts of samples with site"""
+    return parse('pindel', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-    #Add 'Count' to prefixes for correct dict zipping/printing    
-    prefixes.append('Count')
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
+def parse_breakdancer(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the breakdancer analysis file, give total counts of samples with site"""
+    return parse('breakdancer', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
+def parse_snp(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the snp output file, give ref|var read counts per sample"""
+    return parse('snp', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
 def parse_cnv_exon(files, specimens, annotation, prefixes, variant_keys, sort_order):
     """Parse the cnv_exon output, give ave_log_ratio"""
-    files = filter(filters.cnv_exon_analysis, files)
-    variant_keys = ['Position', 'Gene' ]
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            log_pfx=pfx['mini-pfx']+'_Log'
-            prefixes.append(log_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][log_pfx] = row['Ave_Adjusted_Log_Ratio']
-                    annotation[variant] = row
-
-    annotation_headers = [
-        'Transcripts']
-    
-    fieldnames = variant_keys + annotation_headers + prefixes
-    #print prefixes, fieldnames, variant_keys
-    return specimens, annotation, prefixes, fieldnames, variant_keys
+    return parse('cnv_exon', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
 def parse_cnv_gene(files, specimens, annotation, prefixes, variant_keys, sort_order):
     """Parse the cnv_genes output, give ave_log_ratio"""
-    files = filter(filters.cnv_gene_analysis, files)
-    variant_keys = ['Position', 'Gene' ]
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            log_pfx=pfx['mini-pfx']+'_Log'
-            prefixes.append(log_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][log_pfx] = row['Ave_Adjusted_Log_Ratio']
-                    annotation[variant] = row
+    return parse('cnv_gene', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-    annotation_headers = [
-        'Transcripts']
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys
-    
+def parse_annotsv(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the annotsv analysis file, give total counts of samples with site"""
+    return parse('annotsv', files, specimens, annotation, prefixes, variant_keys, sort_order)
+
+def parse_amplicon(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the amplicon analysis file, give mean coverage per sample"""
+    return parse('amplicon', files, specimens, annotation, prefixes, variant_keys, sort_order)
+
+def parse_coveragekit(files, specimens, annotation, prefixes, variant_keys, sort_order):
+    """Parse the coverage kit analysis file, give total counts of samples over 250x"""
+    return parse('coveragekit', files, specimens, annotation, prefixes, variant_keys, sort_order)
 
 def parse_hsmetrics(lines, variant_keys):
     """
@@ -451,102 +845,3 @@ def parse_qualitymetrics(lines, variant_keys):
     #Only print the keys we care about:
     output_dict = dict(zip(variant_keys,itemgetter(*variant_keys)(metrics_dict)))
     return output_dict, variant_keys
-
-def parse_annotsv(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the annotsv analysis file, give total counts of samples with site"""
-
-    files = filter(filters.annotsv_analysis, files)
-    variant_keys = ['Event1', 'Event2']
-    annotation_headers = ['Gene1',
-                    'Gene2',
-                    'location1',
-                    'location2',
-                    'NM',
-                    '1000g_event',
-                    '1000g_max_AF',
-                    'Repeats1',
-                    'Repeats2',
-                    'DGV_GAIN_found|tested',
-                    'DGV_LOSS_found|tested']
-
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            prefixes.append(pfx['mini-pfx'])
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][pfx['mini-pfx']] = row['QUAL']
-                    annotation[variant] = row
-
-                    
-    #Update the specimen dict for this variant, count samples present
-    for key, value in specimens.iteritems():
-        specimens[key]['Count']=len(value)
-
-    #Add 'Count' to prefixes for correct dict zipping/printing    
-    prefixes.append('Count')
-    fieldnames = variant_keys + annotation_headers + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
-
-def parse_amplicon(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the annotsv analysis file, give total counts of samples with site"""
-
-    files = filter(filters.amplicon_analysis, files)
-    variant_keys = ['Position', 'Probe']
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string
-            prefixes.append(pfx['mini-pfx'])
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][pfx['mini-pfx']] = row['MeanCoverage']
-                    annotation[variant] = row
-
-    fieldnames = variant_keys + prefixes
-    return specimens, annotation, prefixes, fieldnames, variant_keys            
-
-def parse_coveragekit(files, specimens, annotation, prefixes, variant_keys, sort_order):
-    """Parse the coverage kit analysis file, give total counts of samples with site"""
-    files=list(files)
-    variant_keys = ['RegionID']
-    annotation_headers=['Position']
-    for sample in sort_order:
-        #Grab the file for each sample, in specified sort order
-        pfx_file = [s for s in files if sample in s.fname]
-        if pfx_file:
-            pfx_file = pfx_file[0]
-            pfx = munge_pfx(pfx_file.fname)
-            #Create a smaller version of this really long string, if possible
-            cov_pfx=pfx['mini-pfx']+'_AveCoverage'
-            prefixes.append(cov_pfx)
-            with open(os.path.join(pfx_file.dir, pfx_file.fname)) as fname:
-                reader = csv.DictReader(fname, delimiter='\t')
-                for row in reader:
-                    variant = tuple(row[k] for k in variant_keys)
-                    specimens[variant][cov_pfx] = row['AverageCoverage']
-                    annotation[variant] = row
-
-    #Update the specimen dict for this variant, count samples over threshold
-    for region, sample_data in specimens.iteritems():
-        total=0
-        for s in sample_data.values():
-            if float(s)>=250:
-                total+=1
-        specimens[region]['Count']=total   
-
-    #Add 'Count' to prefixes for correct dict zipping/printing    
-    prefixes.append('Count')
-    fieldnames = variant_keys + annotation_headers + prefixes 
-    return specimens, annotation, prefixes, fieldnames, variant_keys  
@@ -6,7 +6,7 @@ import argparse
 import pandas as pd
 import sys
 import csv
-from munging.annotation import multi_split, chromosomes
+from munging.annotation import multi_split, normalize_chrom
 from intervaltree import Interval, IntervalTree
 
 log = logging.getLogger(__name__)
@@ -68,7 +68,7 @@ def parse_sv_event1(data):
     '''
     #Only process chr1-23, X, Y
     try:
-        data['Event1']='chr'+str(chromosomes[data['SV chrom']])+':'+str(data['SV start'])
+        data['Event1']='chr'+str(normalize_chrom(data['SV chrom']))+':'+str(data['SV start'])
     except KeyError:
         pass
 
@@ -87,14 +87,14 @@ def parse_sv_alt(data):
         if ':' in a:
             try:
                 chrom=a.split(':')
-                data['Event2']='chr'+str(chromosomes[a[0]])+str(a[1:])
+                data['Event2']='chr'+str(normalize_chrom(a[0]))+str(a[1:])
                 data['Seq']=b
             except KeyError:
                 pass
         else:
             try:
                 chrom=b.split(':')
-                data['Event2']='chr'+str(chromosomes[b[0]])+str(b[1:])
+                data['Event2']='chr'+str(normalize_chrom(b[0]))+str(b[1:])
                 data['Seq']=a
             except KeyError:
                 pass
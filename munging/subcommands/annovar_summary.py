@@ -5,6 +5,10 @@ Usage:
 
  munge annovar_summary /path/to/captured/genes/ $SAVEPATH/$PFX.* -o $SAVEPATH/${PFX}_Analysis.txt;
 
+Input files are the outputs of annotate_variation.pl for each database,
+matched by name, or VCFs (.vcf or .vcf.gz) annotated with every database
+by table_annovar.pl -vcfinput, which are read in a single pass.
+
 """
 
 import logging
@@ -12,10 +16,15 @@ import sys
 import re
 import argparse
 import csv
+import heapq
+import multiprocessing
 from collections import defaultdict
+from itertools import groupby, izip
+from operator import itemgetter
 from os import path
 
 from munging.annotation import get_location, multi_split, split_string_in_two
+from munging.utils import external_sort, opener
 
 
 
@@ -27,7 +36,7 @@ def build_parser(parser):
         help='Type of files to create tab, SNP or INDEL')
     parser.add_argument(
         'infiles', action='append', nargs='+',
-        help='Input files')
+        help='Input files: annovar outputs, or VCFs annotated by table_annovar.pl -vcfinput')
     parser.add_argument(
         '-o', '--outfile',
         help='Output file', default=sys.stdout,
@@ -35,6 +44,17 @@ def build_parser(parser):
     parser.add_argument(
         '--strict', action='store_true', default=False,
         help='Exit with error if an input file has no match.')
+    parser.add_argument(
+        '--stream', action='store_true', default=False,
+        help='Sort each input file by variant and merge them a variant at a time, '
+        'writing each variant as soon as it is merged, to bound memory on large inputs.')
+    parser.add_argument(
+        '--chunk-rows', type=int, default=100000,
+        help='With --stream, sort input files in chunks of this many rows [%(default)s]')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='Number of processes reading input files at once, '
+        'not supported with --stream [%(default)s]')
 
 variant_headers = ['chr', 'start', 'stop', 'Ref_Base', 'Var_Base']
 
@@ -96,6 +116,73 @@ pindel_file_types = {
                                 [2, 3, 4, 5, 6]),
     'pindel.exonic_variant_function': ({1: 'var_type_2', 2: 'Transcripts'}, [3, 4, 5, 6, 7]),
 }
+# INFO fields of a VCF annotated by table_annovar.pl -vcfinput, and
+# the column of the files in snp_file_types each one stands in for. A
+# tuple of fields is joined with ',', as in the *_dropped file of a
+# database with several columns. The generic databases (CADD, UW_freq,
+# clinical_variants) are named as in their hg19_*.txt files.
+dbnsfp30a_fields = (
+    'SIFT_score', 'SIFT_pred', 'Polyphen2_HDIV_score', 'Polyphen2_HDIV_pred',
+    'Polyphen2_HVAR_score', 'Polyphen2_HVAR_pred', 'LRT_score', 'LRT_pred',
+    'MutationTaster_score', 'MutationTaster_pred', 'MutationAssessor_score',
+    'MutationAssessor_pred', 'FATHMM_score', 'FATHMM_pred', 'PROVEAN_score',
+    'PROVEAN_pred', 'VEST3_score', 'CADD_raw', 'CADD_phred', 'DANN_score',
+    'fathmm-MKL_coding_score', 'fathmm-MKL_coding_pred', 'MetaSVM_score',
+    'MetaSVM_pred', 'MetaLR_score', 'MetaLR_pred', 'integrated_fitCons_score',
+    'integrated_confidence_value', 'GERP++_RS', 'phyloP7way_vertebrate',
+    'phyloP20way_mammalian', 'phastCons7way_vertebrate',
+    'phastCons20way_mammalian', 'SiPhy_29way_logOdds')
+
+vcf_info_fields = [
+    ('var_type_1', 'Func.refGene'),
+    ('var_type_2', 'ExonicFunc.refGene'),
+    ('Transcripts', 'AAChange.refGene'),
+    ('1000g_ALL', '1000g2015aug_all'),
+    ('1000g_AMR', '1000g2015aug_amr'),
+    ('1000g_AFR', '1000g2015aug_afr'),
+    ('1000g_SAS', '1000g2015aug_sas'),
+    ('1000g_EAS', '1000g2015aug_eas'),
+    ('1000g_EUR', '1000g2015aug_eur'),
+    ('EXAC', ('ExAC_ALL', 'ExAC_AFR', 'ExAC_AMR', 'ExAC_EAS', 'ExAC_FIN', 'ExAC_NFE', 'ExAC_OTH', 'ExAC_SAS')),
+    ('Cosmic', 'cosmic70'),
+    ('ljb_Scores', dbnsfp30a_fields),
+    ('EVS_esp6500_ALL', 'esp6500siv2_all'),
+    ('EVS_esp6500_EU', 'esp6500siv2_ea'),
+    ('EVS_esp6500_AA', 'esp6500siv2_aa'),
+    ('UW_Freq_list', 'UW_freq'),
+    ('NCI60', 'nci60'),
+    ('ClinVar', 'clinvar_20150629'),
+    ('CADD', 'CADD'),
+    ('rsid_2', 'snp138'),
+    ('splicing', ('dbscSNV_ADA_SCORE', 'dbscSNV_RF_SCORE')),
+    ('Clinically_Flagged', 'clinical_variants'),
+]
+
+# columns of the rows made from a VCF by vcf_rows, after the variant:
+# those made from the record and its first sample, then vcf_info_fields
+vcf_record_columns = ['Gene', 'Segdup', 'Zygosity', 'rsid_1', 'GATK_Score', 'Read_Headers', 'Reads']
+vcf_columns = vcf_record_columns + [key for key, fields in vcf_info_fields]
+
+# (header_ids, var_key_ids) of the rows made from a VCF, as in snp_file_types
+vcf_file_type = (dict(enumerate(vcf_columns, len(variant_headers))), range(len(variant_headers)))
+
+def _info_index():
+    """
+    Map each INFO field of vcf_info_fields to (index in vcf_columns,
+    place among the fields joined for it, number of fields joined), the
+    last two None for a column of a single field
+    """
+    index = {}
+    for key, names in vcf_info_fields:
+        if isinstance(names, tuple):
+            for j, name in enumerate(names):
+                index[name] = (vcf_columns.index(key), j, len(names))
+        else:
+            index[names] = (vcf_columns.index(key), None, None)
+    return index
+
+vcf_info_index = _info_index()
+
 log = logging.getLogger(__name__)
 
 def get_reads(headers, data):
@@ -189,28 +276,229 @@ def munge_transcript(data, RefSeqs):
             PROTEIN.append(prot)
     return ' '.join(CODING), ' '.join(PROTEIN)
 
-def map_headers(fname, header_ids, variant_idx):
+def is_vcf(fname):
+    return fname.endswith(('.vcf', '.vcf.gz'))
+
+def _unescape(value):
+    """Undo the escaping of ';' and '=' in the INFO values of table_annovar"""
+    return value.replace('\\x3b', ';').replace('\\x3d', '=')
+
+def annovar_variant(chrom, pos, ref, alt):
+    """
+    Return the (chr, start, stop, Ref_Base, Var_Base) annovar
+    (convert2annovar.pl) gives an allele of a VCF record
+    """
+    pos = int(pos)
+    if len(ref) > len(alt) and ref.startswith(alt):
+        #deletion
+        start = pos + len(alt)
+        return chrom, str(start), str(start + len(ref) - len(alt) - 1), ref[len(alt):], '-'
+    elif len(ref) < len(alt) and alt.startswith(ref):
+        #insertion
+        start = pos + len(ref) - 1
+        return chrom, str(start), str(start), '-', alt[len(ref):]
+    return chrom, str(pos), str(pos + len(ref) - 1), ref, alt
+
+def allele_info(info, n_alleles):
+    """
+    Return a dict of the annovar INFO fields of each of the n_alleles
+    alternate alleles of a VCF record. table_annovar writes the fields
+    of each allele between ANNOVAR_DATE and ALLELE_END; without them,
+    every field applies to every allele.
+    """
+    alleles, fields = [], None
+    for item in info.split(';'):
+        key, _, value = item.partition('=')
+        if key == 'ANNOVAR_DATE':
+            fields = {}
+            alleles.append(fields)
+        elif key == 'ALLELE_END':
+            fields = None
+        elif fields is not None:
+            fields[key] = value
+    if not alleles:
+        fields = dict(item.partition('=')[::2] for item in info.split(';'))
+        alleles = [fields] * n_alleles
+    #an allele annovar wrote no fields for has none
+    return (alleles + [{}] * n_alleles)[:n_alleles]
+
+def _info_value(fields, name):
+    """The value of the INFO field name, or '' if annovar has none"""
+    value = fields.get(name, '.')
+    return '' if value == '.' else _unescape(value)
+
+def info_values(fields):
+    """
+    The values of the INFO fields of an allele for the columns of
+    vcf_info_fields, as a list of the length of vcf_columns
+    """
+    values = [''] * len(vcf_columns)
+    joined = {}
+    #an allele has only some of the fields
+    for name, value in fields.iteritems():
+        if value == '.' or name not in vcf_info_index:
+            continue
+        i, j, n = vcf_info_index[name]
+        if j is None:
+            values[i] = _unescape(value)
+        else:
+            if i not in joined:
+                joined[i] = ['.'] * n
+            joined[i][j] = value
+    for i, parts in joined.iteritems():
+        values[i] = _unescape(','.join(parts))
+    return values
+
+def vcf_gene(fields):
+    """
+    The Gene column of a variant_function file: each gene of
+    Gene.refGene, followed by its GeneDetail.refGene in parentheses
+    """
+    genes = re.split('[;,]', _info_value(fields, 'Gene.refGene'))
+    details = _info_value(fields, 'GeneDetail.refGene')
+    if not details:
+        return ','.join(genes)
+    details = details.split(';')
+    if len(details) == len(genes):
+        return ','.join('{}({})'.format(gene, detail) for gene, detail in zip(genes, details))
+    return '{}({})'.format(','.join(genes), ','.join(details))
+
+def zygosity(genotype):
+    """'hom' or 'het', as convert2annovar.pl gives the genotype of a sample"""
+    alleles = set(re.split('[/|]', genotype))
+    return 'hom' if len(alleles) == 1 and not alleles & {'0', '.'} else 'het'
+
+var_type_1, var_type_2 = vcf_columns.index('var_type_1'), vcf_columns.index('var_type_2')
+
+def vcf_rows(infile):
+    """
+    Yield a row for each alternate allele of the records of a VCF
+    annotated by table_annovar.pl -vcfinput: the annovar variant,
+    followed by the columns in vcf_columns, with the read info of the
+    first sample.
+    """
+    for line in infile:
+        if line.startswith('#'):
+            continue
+        row = line.rstrip('\r\n').split('\t')
+        chrom, pos, rsid, ref, alts, qual, _, info = row[:8]
+        read_headers, reads = (row[8], row[9]) if len(row) > 9 else ('', '')
+        genotype = reads.split(':', 1)[0] if read_headers.startswith('GT') else ''
+        alts = alts.split(',')
+        for alt, fields in zip(alts, allele_info(info, len(alts))):
+            #the genomicSuperDups file has the name of the database, not the matching region, in its first column
+            segdup = 'segdup' if _info_value(fields, 'genomicSuperDups') else ''
+            values = info_values(fields)
+            values[:len(vcf_record_columns)] = [vcf_gene(fields), segdup, zygosity(genotype) if genotype else '', rsid, qual, read_headers, reads]
+            #table_annovar separates the functions of a variant with ';', and
+            #writes the spaces of 'nonsynonymous SNV' and the like as '_'
+            values[var_type_1] = values[var_type_1].replace(';', ',')
+            values[var_type_2] = values[var_type_2].replace('_', ' ')
+            yield list(annovar_variant(chrom, pos, ref, alt)) + values
+
+def input_rows(infile, fname):
+    """
+    The rows of an input file: its tab delimited columns, or the rows
+    vcf_rows makes of a VCF
+    """
+    if is_vcf(fname):
+        return vcf_rows(infile)
+    return csv.reader(infile, delimiter='\t')
+
+def map_headers(fname, header_ids, variant_idx, positions=None):
     """
     Gets header(s) and info from each file
     """
     # dict mapping variant keys to columns
-    with open(fname, 'rU') as infile:
-        reader = csv.reader(infile, delimiter='\t')
-        for row in reader:
+    with opener(fname, 'rU') as infile:
+        reader = input_rows(infile, fname)
+        for variant_id, data in map_rows(reader, header_ids, variant_idx, positions):
+            yield (variant_id, data)
+
+def _getter(idx):
+    """itemgetter for the indexes idx, always returning a tuple"""
+    if len(idx) == 1:
+        i, = idx
+        return lambda row: (row[i],)
+    return itemgetter(*idx)
+
+def projector(header_ids, variant_idx, positions=None):
+    """
+    Return a function of a row of a file, returning its (variant_id,
+    data) for header_ids and variant_idx. Each variant's Position is
+    formatted once, and kept in positions (a dict, which may be shared
+    between files) for its other rows.
+    """
+    #keys of the data dict, in the order of the columns they are read from
+    keys = [key for i, key in header_ids.items()]
+    values_of = _getter([i for i, key in header_ids.items()])
+    variant_of = _getter(variant_idx)
+    if positions is None:
+        positions = {}
+
+    def project(row):
+        #adds the value from each position (2,3,4,5,6) to the variant_id
+        variant_id = variant_of(row)
+
+        #create dict of data from this file; key is included only
+        #if value is not the empty string
+        data = {key: value for key, value in izip(keys, values_of(row)) if value.strip()}
+        try:
+            data['Position'] = positions[variant_id]
+        except KeyError:
+            data['Position'] = positions[variant_id] = get_location(*variant_id[:3])
 
-            #adds the value from each position (2,3,4,5,6) to the variant_id
-            variant_id = tuple(row[i] for i in variant_idx)
+        #add the variants {2:'chr', 3:'start', 4:'stop, 5:'ref', 6:'var'}
+        data.update(izip(variant_headers, variant_id))
+        return (variant_id, data)
 
-            #create dict of variants {2:'chr', 3:'start', 4:'stop, 5:'ref', 6:'var'}
-            variant_dict = dict(zip(variant_headers, variant_id))
+    return project
 
-            #create dict of data from this file; key is included only
-            #if value is not the empty string
-            data = dict((key, row[i]) for i, key in header_ids.items() if row[i].strip())
-            data['Position'] = get_location(**variant_dict)
+def map_rows(rows, header_ids, variant_idx, positions=None):
+    """
+    Gets header(s) and info from each row of a file
+    """
+    project = projector(header_ids, variant_idx, positions)
+    for row in rows:
+        yield project(row)
 
-            yield (variant_id, dict(data, **variant_dict))
+def sorted_headers(fname, header_ids, variant_idx, chunk_rows=100000):
+    """
+    map_headers, in order of the variant_id of each row
+    """
+    with opener(fname, 'rU') as infile:
+        reader = input_rows(infile, fname)
+        rows = external_sort(reader, lambda row: tuple(row[i] for i in variant_idx), chunk_rows)
+        for variant_id, data in map_rows(rows, header_ids, variant_idx):
+            yield (variant_id, data)
 
+def read_columns(job):
+    """
+    Read an input file for map_headers in a worker process, returning
+    its data compactly: the header names, the variant_id of each row,
+    and the values of each row for those headers (None for empty
+    values) followed by its Position.
+    """
+    fname, header_ids, variant_idx = job
+    project = projector(header_ids, variant_idx)
+    keys = [key for i, key in header_ids.items()]
+    variants, values = [], []
+    with opener(fname, 'rU') as infile:
+        for row in input_rows(infile, fname):
+            variant_id, data = project(row)
+            variants.append(variant_id)
+            values.append(tuple(data.get(key) for key in keys) + (data['Position'],))
+    return keys, variants, values
+
+def map_columns(headers, variants, values):
+    """
+    Gets the (variant_id, data) of each row read by read_columns, as map_headers does
+    """
+    for variant_id, row in zip(variants, values):
+        data = dict((key, value) for key, value in zip(headers, row) if value is not None)
+        data['Position'] = row[-1]
+        data.update(zip(variant_headers, variant_id))
+        yield (variant_id, data)
 
 def get_allele_freq(data):
     """
@@ -243,59 +531,125 @@ def munge_ljb_scores(data):
 
     return polyphen, sift, mutation_taster, gerp
 
+# Columns that may hold a different value in each file for a variant;
+# while merging, a column seen with more than one distinct value holds a
+# tuple of them in the order seen, joined with ',' by munge_variant
+multi_value_keys = ['Transcripts', 'Gene', 'var_type_1', 'var_type_2']
+merged_keys = frozenset(multi_value_keys + ['Reads', 'Read_Headers'])
+
+def set_reads(output, read_headers, reads):
+    """
+    Set the read info of output from reads
+    """
+    output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred'] = get_reads(read_headers, reads)
+
 def largest_variant_reads(output,data):
     """
     return the read info that has the highest variant read
     """
+    reads = data.get('Reads')
     #Grab the higest read count from pindel
-    if data.has_key('Reads2'):
-        if data['Reads2'].split(',')[:-1]> data['Reads'].split(',')[:-1]:
-            data['Reads']=data['Reads2']
-
-    #Keep the highest variant readcount 
-    if output.has_key('Var_Reads') and data.get('Reads'):
-        old_ref_read, old_var_read, old_phred = output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred']
-        new_ref_read, new_var_read, new_phred = get_reads(data.get('Read_Headers'),data.get('Reads'))
-        if int(old_var_read) >  int(new_var_read):
-            output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred'] = old_ref_read, old_var_read, old_phred
-        else:
-            output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred'] = new_ref_read, new_var_read, new_phred
-    elif "Var_Reads" not in output.keys() and data.get('Reads'):
-        output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred'] = get_reads(data.get('Read_Headers'),data.get('Reads'))
+    if reads and 'Reads2' in data and data['Reads2'].split(',')[:-1] > reads.split(',')[:-1]:
+        reads = data['Reads2']
+
+    #Keep the highest variant readcount
+    if reads and 'Var_Reads' not in output:
+        set_reads(output, data.get('Read_Headers'), reads)
+    elif reads:
+        ref_reads, var_reads, phred = get_reads(data.get('Read_Headers'), reads)
+        try:
+            #keep the variant read count of output as an int to compare with later files
+            if 'var_read_count' not in output:
+                output['var_read_count'] = int(output['Var_Reads'])
+            var_read_count = int(var_reads)
+        except ValueError:
+            #a count that is not a number (e.g. '.') keeps the reads of output
+            var_read_count = None
+        if var_read_count is not None and var_read_count >= output['var_read_count']:
+            output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred'] = ref_reads, var_reads, phred
+            output['var_read_count'] = var_read_count
 
     return output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred']
 
-        
 def merge_data(output,data):
     """
     Merge data in certain columns 
     """
-    multi_trans_keys=['Transcripts','Gene','var_type_1','var_type_2']
-    data_keys=data.keys()
-    #If position already in output{}, update certain fields
-    for key in multi_trans_keys:
-        #if key is already in output dict and in new file
-        if key in output.keys() and data.get(key):
-            #Make sure the data isn't a duplicate
-            if data.get(key) not in output[key]:
-                #Make a comma delimited list of info
-                output[key]=','.join([output[key],data.get(key)])
-            #If position has been seen but this file has no data for this key, set to original data
-        elif key in output.keys() and not data.get(key):
-            output[key]=output[key]
-            #If position has been seen but there was not data for this data, add this file's data 
-        elif key not in output.keys() and data.get(key):
-            output[key]=data.get(key)
-    if output.has_key('Reads') or data.has_key('Reads'):
-        output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred'] = largest_variant_reads(output,data)
-
-    multi_trans_keys.extend(['Reads', 'Read_Headers'])
-    for k in data_keys:
-        if k not in multi_trans_keys:
-            output[k]=data.get(k)
+    for key in multi_value_keys:
+        value = data.get(key)
+        if value:
+            values = output.get(key)
+            #Make sure the data isn't a duplicate, or part of the values already seen
+            if values is None:
+                output[key] = value
+            elif type(values) is tuple:
+                if ',' in value:
+                    #it may span values, as it would their joined string
+                    seen = value in ','.join(values)
+                else:
+                    seen = any(value in v for v in values)
+                if not seen:
+                    output[key] = values + (value,)
+            elif value not in values:
+                output[key] = (values, value)
+    if data.get('Reads'):
+        largest_variant_reads(output, data)
+
+    for k, v in data.iteritems():
+        if k not in merged_keys:
+            output[k] = v
+    return output
+
+def add_data(output, data):
+    """
+    Add the data of one file for a variant to the output for the variant
+    """
+    if output:
+        return merge_data(output, data)
+    output.update(data)
+    if 'Reads' in output and 'Var_Reads' not in output:
+        set_reads(output, data.get('Read_Headers'), data.get('Reads'))
     return output
 
+def munge_variant(data, RefSeqs):
+    """
+    Modify the fields of the merged data of a variant for writing
+    """
+    for key in multi_value_keys:
+        if type(data.get(key)) is tuple:
+            data[key] = ','.join(data[key])
+    variants=[data.get('var_type_2'),data.get('var_type_1')]
+    data['Variant_Type'] = ','.join(filter(None, variants))
+    data['Gene'], data['Transcripts'] = munge_gene_and_Transcripts(data, RefSeqs)
+    data['c.'], data['p.'] = munge_transcript(data, RefSeqs)
+    data['Polyphen'], data['Sift'],data['Mutation_Taster'],data['Gerp'] = munge_ljb_scores(data)
+    data['dbSNP_ID'] = data.get('rsid_1') or data.get('rsid_2')
+    data['1000g_ALL'] = data.get('1000g_ALL') or -1
+    data['1000g_AMR'] = data.get('1000g_AMR') or -1
+    data['1000g_SAS'] = data.get('1000g_SAS') or -1
+    data['1000g_EAS'] = data.get('1000g_EAS') or -1
+    data['1000g_AFR'] = data.get('1000g_AFR') or -1
+    data['1000g_EUR'] = data.get('1000g_EUR') or -1
+    data['UW_DEC_p'] = data.get('UW_DEC_p') or -1
+    data['EXAC'] = data.get('EXAC').split(',')[0] if data.get('EXAC') else -1      
+    data['EVS_esp6500_ALL'] = data.get('EVS_esp6500_ALL').split(',')[0] if data.get('EVS_esp6500_ALL') else -1
+    data['EVS_esp6500_AA'] = data.get('EVS_esp6500_AA').split(',')[0] if data.get('EVS_esp6500_AA') else -1
+    data['EVS_esp6500_EU'] = data.get('EVS_esp6500_EU').split(',')[0] if data.get('EVS_esp6500_EU') else -1
+    #CADD is raw score, phred score. We only care about phred
+    _, data['CADD'] = split_string_in_two(data.get('CADD'))
+    data['ADA_Alter_Splice'],data['RF_Alter_Splice'] = split_string_in_two(data.get('splicing'))
+    data['UW_Freq'], data['UW_Count'] = split_string_in_two(data.get('UW_Freq_list'))
+    data['Allele_Frac'] = get_allele_freq(data)
+    return data
+
+def _tagged(variants, i):
+    """Tag the (var_key, data) of the i-th input file for merging"""
+    for line, (var_key, data) in enumerate(variants):
+        yield var_key, i, line, data
+
 def action(args):
+    if args.stream and args.jobs > 1:
+        sys.exit('--jobs is not supported with --stream')
 
     (infiles, ) = args.infiles
 
@@ -373,16 +727,20 @@ def action(args):
 
     writer.writeheader()
 
-    # accumulate data from all input files for each variant
-    output = defaultdict(dict)
-    for fname in infiles:
-        if args.type == 'SNP':
-            file_types = snp_file_types
-        elif args.type == 'INDEL':
-            file_types = indel_file_types
-        elif args.type == 'PINDEL':
-            file_types = pindel_file_types
+    if args.type == 'SNP':
+        file_types = snp_file_types
+    elif args.type == 'INDEL':
+        file_types = indel_file_types
+    elif args.type == 'PINDEL':
+        file_types = pindel_file_types
 
+    inputs = []
+    for fname in infiles:
+        if is_vcf(fname):
+            #a VCF annotated by table_annovar.pl -vcfinput has the columns of every file
+            header_ids, var_key_ids = vcf_file_type
+            inputs.append((fname, header_ids, var_key_ids))
+            continue
         try:
             _, file_type = path.basename(fname).split('.', 1)
         except ValueError:
@@ -400,37 +758,41 @@ def action(args):
             if args.strict:
                 sys.exit(1)
             continue
-        for var_key, data in map_headers(fname, header_ids, var_key_ids):
-            if var_key in output:
-                output[var_key]=merge_data(output[var_key],data)
-            else:
-                output[var_key].update(data)
-                if output[var_key].has_key('Reads') and not output[var_key].has_key('Var_Reads'):
-                    output[var_key]['Ref_Reads'], output[var_key]['Var_Reads'], output[var_key]['Variant_Phred'] = get_reads(data.get('Read_Headers'),data.get('Reads'))
+        inputs.append((fname, header_ids, var_key_ids))
+
+    if args.stream:
+        # merge the sorted input files a variant at a time, in file order for each variant
+        streams = [_tagged(sorted_headers(fname, header_ids, var_key_ids, args.chunk_rows), i)
+                   for i, (fname, header_ids, var_key_ids) in enumerate(inputs)]
+        for var_key, group in groupby(heapq.merge(*streams), itemgetter(0)):
+            data = {}
+            for _, _, _, file_data in group:
+                data = add_data(data, file_data)
+            writer.writerow(munge_variant(data, RefSeqs))
+        return
+
+    if args.jobs > 1:
+        # read the input files at once, then merge them in file order
+        pool = multiprocessing.Pool(args.jobs)
+        files = (map_columns(*c) for c in pool.imap(read_columns, inputs))
+    else:
+        pool = None
+        #each variant's Position is formatted once, not once per file
+        positions = {}
+        files = (map_headers(fname, header_ids, var_key_ids, positions) for fname, header_ids, var_key_ids in inputs)
+
+    # accumulate data from all input files for each variant
+    output = defaultdict(dict)
+    try:
+        for variants in files:
+            for var_key, data in variants:
+                output[var_key] = add_data(output[var_key], data)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     sort_key = lambda row: [(row[k]) for k in ['chr', 'start', 'stop', 'Ref_Base', 'Var_Base']]
     # # write each row (with all data aggregated), modifying fields as necessary
     for data in sorted(output.values(), key=sort_key):
-        variants=[data.get('var_type_2'),data.get('var_type_1')]
-        data['Variant_Type'] = ','.join(filter(None, variants))
-        data['Gene'], data['Transcripts'] = munge_gene_and_Transcripts(data, RefSeqs)
-        data['c.'], data['p.'] = munge_transcript(data, RefSeqs)
-        data['Polyphen'], data['Sift'],data['Mutation_Taster'],data['Gerp'] = munge_ljb_scores(data)
-        data['dbSNP_ID'] = data.get('rsid_1') or data.get('rsid_2')
-        data['1000g_ALL'] = data.get('1000g_ALL') or -1
-        data['1000g_AMR'] = data.get('1000g_AMR') or -1
-        data['1000g_SAS'] = data.get('1000g_SAS') or -1
-        data['1000g_EAS'] = data.get('1000g_EAS') or -1
-        data['1000g_AFR'] = data.get('1000g_AFR') or -1
-        data['1000g_EUR'] = data.get('1000g_EUR') or -1
-        data['UW_DEC_p'] = data.get('UW_DEC_p') or -1
-        data['EXAC'] = data.get('EXAC').split(',')[0] if data.get('EXAC') else -1      
-        data['EVS_esp6500_ALL'] = data.get('EVS_esp6500_ALL').split(',')[0] if data.get('EVS_esp6500_ALL') else -1
-        data['EVS_esp6500_AA'] = data.get('EVS_esp6500_AA').split(',')[0] if data.get('EVS_esp6500_AA') else -1
-        data['EVS_esp6500_EU'] = data.get('EVS_esp6500_EU').split(',')[0] if data.get('EVS_esp6500_EU') else -1
-        #CADD is raw score, phred score. We only care about phred
-        _, data['CADD'] = split_string_in_two(data.get('CADD'))
-        data['ADA_Alter_Splice'],data['RF_Alter_Splice'] = split_string_in_two(data.get('splicing'))
-        data['UW_Freq'], data['UW_Count'] = split_string_in_two(data.get('UW_Freq_list'))
-        data['Allele_Frac'] = get_allele_freq(data)
-        writer.writerow(data)
+        writer.writerow(munge_variant(data, RefSeqs))
@@ -17,7 +17,7 @@ log = logging.getLogger(__name__)
 
 
 def build_parser(parser):
-    parser.add_argument('refgene', type=Opener(), 
+    parser.add_argument('refgene',
                         help='RefGene file')
     parser.add_argument('bd_file', type=Opener(), 
                         help='Breakdancer output')
@@ -26,13 +26,12 @@ def build_parser(parser):
     parser.add_argument('-o', '--outfile', type=Opener('w'), metavar='FILE',
                         default=sys.stdout, help='output file')
 
-def add_genes(chr_pos_pair, genome_tree):
-    """returns a string with the concatenated set of genes found at the chr_pos_pair coordinates in genome_tree"""
-    chrom = ann.chromosomes[chr_pos_pair[0]]
-    pos = int(chr_pos_pair[1])
-    transcripts = [x[2] for x in genome_tree[chrom][pos]]
-    genes = ann.gene_info_from_transcripts(transcripts)
-    return ';'.join(genes)
+def add_genes(chroms, positions, genome_tree):
+    """returns a list of strings with the concatenated set of genes found at each chrom, position in genome_tree"""
+    chroms = ann.normalize_chroms(chroms)
+    positions = positions.astype(int).values
+    transcripts = genome_tree.transcripts_many(chroms, positions, positions + 1)
+    return [';'.join(ann.gene_info_from_transcripts(ts)) for ts in transcripts]
 
 def add_event(row):
     chrom = str(row[0])
@@ -48,7 +47,7 @@ def filter_genes(row, gene_set):
     return len(gene_intersection) > 0
 
 def action(args):
-    gt = ann.GenomeIntervalTree.from_table(args.refgene)
+    gt = ann.GenomeIntervalTree.from_cache(args.refgene)
 
     # read in only the columns we care about, because real data can be too large sometimes
     headers=['Chr1','Pos1','Chr2','Pos2','Type','Size','num_Reads']
@@ -60,8 +59,7 @@ def action(args):
     df.loc[df['Type'] == 'CTX', 'Size'] = 'N/A'
 
     # discard rows containing events on unsupported chromosomes
-    chroms = ann.chromosomes.keys()
-    df = df[df['Chr1'].isin(chroms) & df['Chr2'].isin(chroms)]
+    df = df[ann.normalize_chroms(df['Chr1']).notnull() & ann.normalize_chroms(df['Chr2']).notnull()]
 
     # check that any calls remain before applying functions or pandas will crash
     if len(df) > 0:
@@ -70,8 +68,8 @@ def action(args):
         df['Event_1'] = df[['Chr1', 'Pos1']].apply(add_event, axis=1)
         df['Event_2'] = df[['Chr2', 'Pos2']].apply(add_event, axis=1)
         # add genes columns
-        df['Gene_1'] = df[['Chr1', 'Pos1']].apply(add_genes, genome_tree = gt, axis=1)
-        df['Gene_2'] = df[['Chr2', 'Pos2']].apply(add_genes, genome_tree = gt, axis=1)
+        df['Gene_1'] = add_genes(df['Chr1'], df['Pos1'], gt)
+        df['Gene_2'] = add_genes(df['Chr2'], df['Pos2'], gt)
 
         if args.genes:
             # read in genes to keep
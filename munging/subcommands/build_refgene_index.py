@@ -0,0 +1,36 @@
+"""
+Prebuild the annotation index for one or more RefGene files
+
+The index is loaded by pindel_summary, breakdancer_summary,
+coverage_metrics and make_cnv_plottable instead of re-parsing the
+RefGene table for every sample. Indexes are stored in $MUNGE_CACHE_DIR
+(default ~/.cache/munge) and are rebuilt automatically when the size or
+modification time of the RefGene file changes; this command always
+rebuilds them, and logs the sha1 of each RefGene file it indexes.
+Without arguments, indexes the RefGene file named by $MUNGE_REFGENE.
+
+Usage:
+
+munge build_refgene_index [/path/to/refgene /path/to/other/refgene ...]
+"""
+
+import logging
+import sys
+import munging.annotation as ann
+
+log = logging.getLogger(__name__)
+
+def build_parser(parser):
+    parser.add_argument('refgene', nargs='*',
+                        help='RefGene file(s) to index, plain or .gz [$%s]' % ann.REFGENE_ENV)
+    parser.add_argument('-d', '--cache-dir',
+                        help='Directory in which to save the index [$%s or ~/.cache/munge]' % ann.CACHE_ENV)
+    parser.add_argument('-b', '--backend', choices=sorted(ann.TRANSCRIPT_BACKENDS), default='array',
+                        help='Transcript implementation to index [%(default)s]')
+
+def action(args):
+    for refgene in args.refgene or [ann.default_refgene()]:
+        gt = ann.GenomeIntervalTree.from_table(refgene, backend=args.backend)
+        index = gt.save_index(refgene, args.cache_dir)
+        log.info('indexed %s transcripts from %s (sha1 %s)', len(gt), refgene, ann.refgene_sha1(refgene))
+        sys.stdout.write(index + '\n')
@@ -26,7 +26,7 @@ def build_parser(parser):
 
 def action(args):
     #read in refgene into genome interval tree
-    gt = ann.GenomeIntervalTree.from_table(args.refgene)
+    gt = ann.GenomeIntervalTree.from_cache(args.refgene)
 
     output = []
 
@@ -51,7 +51,7 @@ def action(args):
     # add annotations
     for row in rows:
         # determine genomic position
-        chrom=ann.chromosomes[row[('CHROM','')]]
+        chrom=ann.normalize_chrom(row[('CHROM','')])
         start=int(row[('POS','min')])
         end=int(row[('POS','max')])
         
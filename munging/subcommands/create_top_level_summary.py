@@ -5,24 +5,41 @@ Usage:
 
 munge create_summary <Type> $SAVEPATH -o $OUTFILE
 
+or, walking the analysis files once for several types:
+
+munge create_summary --types all $SAVEPATH -d $OUTDIR
+
 """
 import logging
 import csv
+import os
 import sys
 import argparse
 import collections
-from itertools import ifilter
+import fnmatch
 from munging import filters,parsers
 from munging.utils import walker
 
 log = logging.getLogger(__name__)
 
+SUMMARY_TYPES = ['pindel','snp','indel','cnv_exon','cnv_gene',
+                 'quality','msi_flagged','clin_flagged','hotspot_flagged',
+                 'glt_flagged', 'annotsv', 'amplicon', 'breakdancer',
+                 'exon_cov', 'gene_cov']
+
+def summary_types(value):
+    """Parse a comma separated list of summary types, or 'all'"""
+    if value == 'all':
+        return list(SUMMARY_TYPES)
+    types = value.split(',')
+    for summary_type in types:
+        if summary_type not in SUMMARY_TYPES:
+            raise argparse.ArgumentTypeError('invalid summary type: {}'.format(summary_type))
+    return types
+
 def build_parser(parser):
-    parser.add_argument('type', 
-                        choices=['pindel','snp','indel','cnv_exon','cnv_gene',
-                        'quality','msi_flagged','clin_flagged','hotspot_flagged', 
-                        'glt_flagged', 'annotsv', 'amplicon', 'breakdancer',
-                        'exon_cov', 'gene_cov'],
+    parser.add_argument('type', nargs='?',
+                        choices=SUMMARY_TYPES,
                         help='Type of output summary to create')
     parser.add_argument('path',
                         help='Path to analysis files')
@@ -31,32 +48,57 @@ def build_parser(parser):
     parser.add_argument('-o','--outfile', type = argparse.FileType('w'),
                         default = sys.stdout,
                         help='Name of the output file')
+    parser.add_argument('-t','--types', type = summary_types,
+                        help='Create several types of summary, a comma separated list of types or '
+                        '"all", from a single walk of the analysis files, instead of one type')
+    parser.add_argument('-d','--outdir', default = '.',
+                        help='Directory for the <type>.txt output file of each of --types [%(default)s]')
+    parser.add_argument('--max-depth', type = int,
+                        help='Only look for analysis files this many directories below path '
+                        '(e.g. 1 for path/<pfx>/) [no limit]')
+    parser.add_argument('--prune', action = 'append', default = [], metavar = 'PATTERN',
+                        help='Do not look for analysis files in directories with names matching '
+                        'this glob pattern; may be given more than once')
+    parser.add_argument('-j','--jobs', type = int, default = 1,
+                        help='Number of processes used to parse sample files [%(default)s]')
+    parser.add_argument('--engine', choices=['python', 'pandas', 'stream'], default='python',
+                        help='Build the summary row by row in python, column by column '
+                        'in pandas, or stream it a variant at a time from the sorted '
+                        'sample files, for summaries too large to hold in memory [%(default)s]')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Cache the parsed results of each sample next to its analysis file, '
+                        'and only re-read samples whose analysis files changed since they were '
+                        'cached (python engine only)')
     
 
-def action(args):
+def write_summary(summary_type, files, sort_order, outfile, args):
+    """Write the summary_type summary of the indexed files to outfile"""
     specimens = collections.defaultdict(dict)
     annotation = {}
     prefixes = []
     variant_keys = []
-    #Get sort order from pipeline manifest. For TGC, this is alpha numeric. For others it is not. 
-    sort_order = [x['barcode_id'] for x in csv.DictReader(args.pipeline_manifest)]
-    files = ifilter(filters.any_analysis, walker(args.path))
-    if args.type == 'indel':
-        parser_type = 'snp'
-    elif args.type == 'exon_cov':
-        parser_type = 'coveragekit'
-        files = list(filter(filters.exon_coverage_analysis, files))
-    elif args.type == 'gene_cov':
-        parser_type = 'coveragekit'
-        files = list(filter(filters.gene_coverage_analysis, files))
+    print "analysis type:",summary_type
+    if args.engine == 'pandas':
+        summary, fieldnames = parsers.parse_frame(summary_type, files, sort_order)
+        summary.to_csv(outfile, sep='\t', index=False, line_terminator='\r\n')
+        return
+    if args.engine == 'stream':
+        fieldnames, rows = parsers.parse_stream(summary_type, files, sort_order)
+        writer = csv.DictWriter(outfile, fieldnames = fieldnames,  extrasaction = 'ignore', delimiter = '\t')
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    if args.incremental:
+        specimens, annotation, prefixes, fieldnames, variant_keys = parsers.parse_incremental(
+            summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order, args.jobs)
+    elif args.jobs > 1:
+        specimens, annotation, prefixes, fieldnames, variant_keys = parsers.parse_parallel(
+            summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order, args.jobs)
     else:
-        parser_type = args.type
-    analysis_type='_'.join(['parsers.parse',parser_type])
-    print "analysis type:",analysis_type
-    chosen_parser='{}(files, specimens, annotation, prefixes, variant_keys, sort_order)'.format(analysis_type)
-    specimens, annotation, prefixes, fieldnames, variant_keys=eval(chosen_parser)
+        specimens, annotation, prefixes, fieldnames, variant_keys = parsers.parse(
+            summary_type, files, specimens, annotation, prefixes, variant_keys, sort_order)
 
-    writer = csv.DictWriter(args.outfile, fieldnames = fieldnames,  extrasaction = 'ignore', delimiter = '\t')
+    writer = csv.DictWriter(outfile, fieldnames = fieldnames,  extrasaction = 'ignore', delimiter = '\t')
     writer.writeheader()
     for variant in sorted(specimens.keys()):
         d = {k:v for k,v in zip(variant_keys,variant)}
@@ -64,4 +106,24 @@ def action(args):
         d.update(annotation[variant])
         writer.writerow(d)
 
-
+def action(args):
+    if bool(args.type) == bool(args.types):
+        sys.exit('give either a summary type or --types')
+    if args.incremental and args.engine != 'python':
+        sys.exit('--incremental is only supported by the python engine')
+    #Get sort order from pipeline manifest. For TGC, this is alpha numeric. For others it is not. 
+    sort_order = [x['barcode_id'] for x in csv.DictReader(args.pipeline_manifest)]
+    prune = lambda pth: any(fnmatch.fnmatch(pth.fname, p) for p in args.prune)
+    files = walker(args.path, max_depth=args.max_depth, prune=prune if args.prune else None,
+                   pattern=filters.ANALYSIS_PATTERN)
+    #Index the walked files by sample once, rather than scanning them for every sample,
+    #and share the index between summary types, each picking its files with its filter
+    files = parsers.SampleFileIndex(files)
+    if args.type:
+        write_summary(args.type, files, sort_order, args.outfile, args)
+        return
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    for summary_type in args.types:
+        with open(os.path.join(args.outdir, '{}.txt'.format(summary_type)), 'w') as outfile:
+            write_summary(summary_type, files, sort_order, outfile, args)
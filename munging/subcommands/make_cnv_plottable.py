@@ -32,7 +32,7 @@ def parse_contra_file(file_name):
     df_plot = pd.DataFrame()
     df_plot['log2'] = df_raw['Adjusted.Mean.of.LogRatio'].astype(float)
     # convert chromosome to standard format ['1', '2', ..., 'X', 'Y', 'GT]
-    df_plot['chr'] = df_raw['Chr'].apply(lambda x: ann.chromosomes[x])
+    df_plot['chr'] = df_raw['Chr'].apply(ann.normalize_chrom)
     df_plot['start_pos'] = df_raw['OriStCoordinate'].astype(int)
     df_plot['end_pos'] = df_raw['OriEndCoordinate'].astype(int)
     return df_plot
@@ -47,7 +47,7 @@ def parse_cnvkit_file(file_name):
     df_plot = pd.DataFrame()
     df_plot['log2'] = df_targets['log2'].astype(float)
     # convert chromosome to standard format ['1', '2', ..., 'X', 'Y', 'GT]
-    df_plot['chr'] = df_targets['chromosome'].apply(lambda x: ann.chromosomes[x])
+    df_plot['chr'] = df_targets['chromosome'].apply(ann.normalize_chrom)
     df_plot['start_pos'] = df_targets['start'].astype(int)
     df_plot['end_pos'] = df_targets['end'].astype(int)
     return df_plot
@@ -61,29 +61,34 @@ def add_annotations(df, genome_tree):
     the information from the first transcript found. If row in df covers more than
     one exon in that transcript, labels with only the lowest exon number from that set.
     """
-    # note, for performance reasons this should be changed to .apply or something non-iterative
-    for i, row in df.iterrows():
-        chrom = row['chr']
-        start = int(row['start_pos'])
-        # searching an interval tree is not inclusive of the endpoint, so increment by one
-        end = int(row['end_pos']) + 1
-        transcript_list = sorted(genome_tree[chrom][start:end])
-
-        if transcript_list:
-            # use only the first (and hopefully only) transcript for adding annotations
-            t = transcript_list[0][2]
-            df.at[i, 'gene'] = t.gene
-            df.at[i, 'transcript'] = t.id
-        
-            # label exons, including those that fall within a UTR
-            exons = sorted(t.get_exons(start, end, report_utr=False))
-            if exons:
-                # use only the first (and hopefully only) exon number for each interval
-                df.at[i, 'exon'] = str(exons[0].number)
-
+    starts = df['start_pos'].astype(int).values
+    # searching an interval tree is not inclusive of the endpoint, so increment by one
+    ends = df['end_pos'].astype(int).values + 1
+
+    # transcripts for every bin are found in one sorted sweep per chromosome, and the
+    # annotations are collected in lists and assigned as whole columns
+    genes, transcripts, exons = [], [], []
+    for start, end, transcript_list in zip(starts, ends, genome_tree.transcripts_many(df['chr'], starts, ends)):
         # if no hits from the genome tree, annotate as intergenic
-        else:
-            df.at[i, 'gene'] = 'intergenic'
+        if not transcript_list:
+            genes.append('intergenic')
+            transcripts.append(np.nan)
+            exons.append(np.nan)
+            continue
+
+        # use only the first (and hopefully only) transcript for adding annotations
+        t = transcript_list[0]
+        genes.append(t.gene)
+        transcripts.append(t.id)
+
+        # label exons, including those that fall within a UTR
+        exon_list = t.get_exons(int(start), int(end), report_utr=False)
+        # use only the first (and hopefully only) exon number for each interval
+        exons.append(str(exon_list[0].number) if exon_list else np.nan)
+
+    df['gene'] = genes
+    df['transcript'] = transcripts
+    df['exon'] = exons
 
 def run_conifer(sample_df, baseline_df, components_removed):
     """
@@ -137,7 +142,7 @@ def action(args):
         raise ValueError("Improper package specified as argument")
 
     # add annotations to the parsed data
-    gt = ann.GenomeIntervalTree.from_table(args.refgene)
+    gt = ann.GenomeIntervalTree.from_cache(args.refgene)
     add_annotations(df, gt)
 
     # apply CoNIFER if requested
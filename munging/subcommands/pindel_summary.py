@@ -44,50 +44,51 @@ def parse_vcf_info(info):
     end = int(info_dict['END']) + 1
     return pd.Series([size, svtype, end])
 
-def get_annotations(row, genome_tree):
-    """returns [gene_label, transcript_label, region_label] for a row in df"""
+def region_label(regions):
+    """returns the most severe of the region types in regions"""
+    for region in ['EXONIC', 'UTR', 'INTRONIC']:
+        if region in regions:
+            return region
+    return 'Intergenic'
+
+def get_annotations(df, genome_tree):
+    """returns a DataFrame of [gene_label, transcript_label, region_label] for each row in df"""
     # determine coordinates
-    chrom = ann.chromosomes[row['CHROM']]
-    chrom_tree = genome_tree[chrom]
-    start = int(row['POS'])
-    end = int(row['End'])
-    # determine affected transcripts
-    start_transcripts = [ x[2] for x in chrom_tree[start] ]
-    end_transcripts = [ x[2] for x in chrom_tree[end] ]
-    spanning_transcripts = [ x[2] for x in chrom_tree[start:end + 1] ]
-    breakend_transcripts = start_transcripts + end_transcripts
-    # get the genes from either breakend
-    breakend_genes = ann.gene_info_from_transcripts(breakend_transcripts)
-    gene_label = ';'.join(sorted(set(breakend_genes)))
-    # get the gene region from the spanning transcripts
-    regions = ann.region_info_from_transcripts(spanning_transcripts, start, end, report_utr=True)
-    if 'EXONIC' in regions:
-        region_label = 'EXONIC'
-    elif 'UTR' in regions:
-        region_label = 'UTR'
-    elif 'INTRONIC' in regions:
-        region_label = 'INTRONIC'
-    else:
-        region_label = 'Intergenic'
-    # get the transcript info from either breakend
-    start_annotations = ann.transcript_info_from_transcripts(start_transcripts, start, report_utr=True)
-    end_annotations = ann.transcript_info_from_transcripts(end_transcripts, end, report_utr=True)
-    transcript_label = ';'.join(sorted(set(start_annotations + end_annotations)))
-
-    return pd.Series([gene_label, transcript_label, region_label])
+    chroms = ann.normalize_chroms(df['CHROM'])
+    starts = df['POS'].astype(int).values
+    ends = df['End'].astype(int).values
+    # determine affected transcripts at either breakend
+    start_transcripts = genome_tree.transcripts_many(chroms, starts, starts + 1)
+    end_transcripts = genome_tree.transcripts_many(chroms, ends, ends + 1)
+    spanning_transcripts = genome_tree.transcripts_many(chroms, starts, ends + 1)
+
+    rows = []
+    for start, end, start_ts, end_ts, spanning_ts in zip(starts, ends, start_transcripts, end_transcripts, spanning_transcripts):
+        # get the genes from either breakend
+        breakend_genes = ann.gene_info_from_transcripts(start_ts + end_ts)
+        gene_label = ';'.join(sorted(set(breakend_genes)))
+        # get the transcript info from either breakend
+        start_annotations = ann.transcript_info_from_transcripts(start_ts, int(start), report_utr=True)
+        end_annotations = ann.transcript_info_from_transcripts(end_ts, int(end), report_utr=True)
+        transcript_label = ';'.join(sorted(set(start_annotations + end_annotations)))
+        # get the gene region from the spanning transcripts
+        regions = ann.region_info_from_transcripts(spanning_ts, int(start), int(end), report_utr=True)
+        rows.append([gene_label, transcript_label, region_label(regions)])
+
+    return pd.DataFrame(rows, index=df.index, columns=['Gene', 'Transcripts', 'Gene_Region'])
 
 def parse_vcf_reads(read_info):
     return int(read_info.split(',')[-1])
 
 def get_position(row):
-    chrom = ann.chromosomes[row['CHROM']]
+    chrom = ann.normalize_chrom(row['CHROM'])
     start = str(row['POS'])
     end = str(row['End'])
     return "{}:{}-{}".format(chrom, start, end)
     
 def action(args):
     #Create interval tree of Transcripts, grouped by chr
-    gt = ann.GenomeIntervalTree.from_table(args.refgene)
+    gt = ann.GenomeIntervalTree.from_cache(args.refgene)
 
     # specify columns to import and names
     if args.multi_reads:
@@ -107,9 +108,8 @@ def action(args):
 
     # concatenate DataFrames into one
     df = pd.concat(readers, ignore_index=True)
-    chroms = ann.chromosomes.keys()
     # filter out entries containing events on unsupported chromosomes
-    df = df[df['CHROM'].isin(chroms)]
+    df = df[ann.normalize_chroms(df['CHROM']).notnull()]
 
     # check whether there are any variants left
     if df.shape[0] > 0:
@@ -118,7 +118,7 @@ def action(args):
         # do not include small insertion/deletion calls from Pindel
         df = df[df['Size'] > 10]
         # add annotations
-        df[['Gene', 'Transcripts', 'Gene_Region']] = df.apply(get_annotations, genome_tree=gt, axis=1)
+        df[['Gene', 'Transcripts', 'Gene_Region']] = get_annotations(df, gt)
         # create the Position field
         df['Position'] = df.apply(get_position, axis=1)
 
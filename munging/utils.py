@@ -6,8 +6,23 @@ import re
 import os
 import shutil
 import logging
+import gzip
+import bz2
+import heapq
+import tempfile
 from collections import namedtuple
+from itertools import chain, islice
 from munging.annotation import multi_split
+
+# scandir lists directories without a stat call per entry; it is in os
+# from python 3.5, and in the scandir package before that
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 from __init__ import __version__
 
 log = logging.getLogger(__name__)
@@ -90,15 +105,133 @@ def mkdir(dirpath, clobber = False):
 
 Path = namedtuple('Path', ['dir','fname'])
 
-def walker(dir):
-    """Recursively traverse direcory `dir`. For each tuple containing
-    (path, dirs, files) return a named tuple with attributes (dir,
-    fname) for each file name in `files`.
+def walker(dir, max_depth=None, prune=None, pattern=None):
+    """Recursively traverse direcory `dir`, yielding a named tuple with
+    attributes (dir, fname) for each file, in the order of os.walk.
+
+    max_depth -- only descend this many directories below `dir`
+      (0 for the files of `dir` alone)
+    prune -- predicate on a named tuple (dir, fname) for each
+      subdirectory, True for directories not to descend into
+    pattern -- regular expression (e.g. filters.ANALYSIS_PATTERN) that
+      a file name must match to be yielded
+    """
+
+    if isinstance(pattern, basestring):
+        pattern = re.compile(pattern)
+    for pth in _walk(dir, max_depth, prune, pattern and pattern.search):
+        yield pth
+
+def _listdir(dir):
+    """Return the (files, dirs) in directory `dir`, as os.walk lists them"""
+
+    files, dirs = [], []
+    try:
+        if scandir is not None:
+            for entry in scandir(dir):
+                if entry.is_dir():
+                    #symlinks to directories are listed, but not walked
+                    if not entry.is_symlink():
+                        dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        else:
+            for name in os.listdir(dir):
+                pth = os.path.join(dir, name)
+                if os.path.isdir(pth):
+                    if not os.path.islink(pth):
+                        dirs.append(name)
+                else:
+                    files.append(name)
+    except OSError:
+        #os.walk skips directories that can't be listed
+        pass
+    return files, dirs
+
+def _walk(dir, max_depth, prune, match):
+    files, dirs = _listdir(dir)
+    for fname in files:
+        if match is None or match(fname):
+            yield Path(dir, fname)
+    if max_depth is not None and max_depth <= 0:
+        return
+    for name in dirs:
+        if prune is not None and prune(Path(dir, name)):
+            continue
+        for pth in _walk(os.path.join(dir, name), max_depth if max_depth is None else max_depth - 1, prune, match):
+            yield pth
+
+
+def _spilled(rows, tmpdir):
+    """Write rows to a temporary tab delimited file in tmpdir, returning its path"""
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix='.txt')
+    with os.fdopen(fd, 'wb') as f:
+        csv.writer(f, delimiter='\t').writerows(rows)
+    return path
+
+def _keyed(f, key, i):
+    for line, row in enumerate(csv.reader(f, delimiter='\t')):
+        yield key(row), i, line, row
+
+def _merged(paths, key):
+    """Yield the rows of the sorted files at paths in order of
+    key(row), rows with equal keys in the order of paths"""
+    files = [open(path, 'rb') for path in paths]
+    try:
+        for _, _, _, row in heapq.merge(*[_keyed(f, key, i) for i, f in enumerate(files)]):
+            yield row
+    finally:
+        for f in files:
+            f.close()
+
+def external_sort(rows, key, chunk_rows=100000, tmpdir=None, fan_in=16):
+    """Yield `rows` (lists of strings, as from csv.reader) in order of
+    key(row), holding at most `chunk_rows` of them in memory. Rows are
+    sorted a chunk at a time, chunks are spilled to temporary files in
+    `tmpdir` when there is more than one, and the chunks merged, at most
+    `fan_in` of them at once so that the number of open files does not
+    grow with the input. As with sorted(), rows with equal keys keep
+    their order.
     """
 
-    for (pth, dirs, files) in os.walk(dir):
-        for fname in files:
-            yield Path(pth, fname)
+    rows = iter(rows)
+    spilled = []
+    #every temporary file, removed when the rows are done with
+    paths = []
+    try:
+        while True:
+            chunk = sorted(islice(rows, chunk_rows), key=key)
+            if not chunk:
+                break
+            if not spilled:
+                peek = list(islice(rows, 1))
+                if not peek:
+                    #a single chunk never leaves memory
+                    for row in chunk:
+                        yield row
+                    return
+                rows = chain(peek, rows)
+            paths.append(_spilled(chunk, tmpdir))
+            spilled.append(paths[-1])
+            del chunk
+        while len(spilled) > fan_in:
+            #merge consecutive chunks, so that rows with equal keys keep their order
+            groups = [spilled[i:i + fan_in] for i in xrange(0, len(spilled), fan_in)]
+            spilled = []
+            for group in groups:
+                if len(group) == 1:
+                    spilled.extend(group)
+                    continue
+                paths.append(_spilled(_merged(group, key), tmpdir))
+                spilled.append(paths[-1])
+                for path in group:
+                    os.remove(path)
+        for row in _merged(spilled, key):
+            yield row
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
 
 
 def munge_pfx(pfx):
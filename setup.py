@@ -32,6 +32,7 @@ params = {'author': 'Sheena Todhunter',
               'XlsxWriter==0.9.6',
               'xlwt==0.7.5',
               'xlrd==0.9.3',
+              'scandir>=1.5; python_version<"3.5"',
           ]
       }
 
@@ -4,6 +4,7 @@ Test the annotation functions
 
 import logging
 import os
+import shutil
 import sys
 import munging.annotation as ann
 from intervaltree import IntervalTree
@@ -25,6 +26,188 @@ class TestAnnotation(TestBase):
         # a collection of transcripts from a densely-packed section of chromosome 1
         self.transcripts=[x[2] for x in self.gt['1'][144146810:146467744]]
 
+    def testRefGeneIndex(self):
+        """
+        Tests that a prebuilt index is written on first use, loaded on the next,
+        and invalidated when the refGene file changes
+        """
+        refgene = os.path.join(self.outdir, 'refgene.tsv')
+        shutil.copyfile(self.refgene, refgene)
+        index = ann.refgene_index_path(refgene, self.outdir)
+        self.assertFalse(os.path.exists(index))
+        gt = ann.GenomeIntervalTree.from_cache(refgene, self.outdir)
+        self.assertTrue(os.path.exists(index))
+        cached = ann.GenomeIntervalTree.from_cache(refgene, self.outdir)
+        self.assertEqual(len(cached), len(self.gt))
+        self.assertEqual(ann.transcript_info_from_transcripts([x[2] for x in cached['1'][144146810:146467744]], 145076000),
+                         ann.transcript_info_from_transcripts(self.transcripts, 145076000))
+        # changing the table creates a new index and removes the stale one
+        with open(refgene, 'a') as f:
+            f.write('# a new comment\n')
+        new_index = ann.refgene_index_path(refgene, self.outdir)
+        self.assertNotEqual(index, new_index)
+        ann.GenomeIntervalTree.from_cache(refgene, self.outdir)
+        self.assertTrue(os.path.exists(new_index))
+        self.assertFalse(os.path.exists(index))
+
+    def testRefGeneIndexErrors(self):
+        """
+        Tests that truncated or corrupt indexes are rebuilt, and that index files are closed
+        """
+        refgene = os.path.join(self.outdir, 'refgene_errors.tsv')
+        shutil.copyfile(self.refgene, refgene)
+        index = ann.GenomeIntervalTree.from_cache(refgene, self.outdir).save_index(refgene, self.outdir)
+        expected = ann.transcript_info_from_transcripts(self.transcripts, 0, sys.maxint)
+
+        # a truncated index is not loaded
+        with open(index, 'rb') as f:
+            data = f.read()
+        with open(index, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        self.assertRaises(ValueError, ann.GenomeIntervalTree.from_index, index)
+        gt = ann.GenomeIntervalTree.from_cache(refgene, self.outdir)
+        self.assertEqual(len(gt), len(self.gt))
+
+        # a chromosome that can not be unpickled is built from the table, and the index removed
+        offset = ann.GenomeIntervalTree.from_index(index)._pending['1'].args[1]
+        with open(index, 'r+b') as f:
+            f.seek(offset)
+            f.write('garbage')
+        with ann.GenomeIntervalTree.from_cache(refgene, self.outdir) as gt:
+            self.assertFalse(gt._index.closed)
+            transcripts = [x[2] for x in gt['1'][144146810:146467744]]
+        self.assertIsNone(gt._index)
+        self.assertEqual(ann.transcript_info_from_transcripts(transcripts, 0, sys.maxint), expected)
+        self.assertFalse(os.path.exists(index))
+
+        # the index is closed once every chromosome is loaded
+        gt = ann.GenomeIntervalTree.from_index(ann.GenomeIntervalTree.from_cache(refgene, self.outdir).save_index(refgene, self.outdir))
+        index_file = gt._index
+        gt.load_all()
+        self.assertTrue(index_file.closed)
+
+    def testLazyGenomeIntervalTree(self):
+        """
+        Tests that a lazy GenomeIntervalTree only builds chromosomes when they are accessed,
+        and annotates the same as an eagerly built one
+        """
+        for gt in [ann.GenomeIntervalTree.from_table(self.refgene, lazy=True),
+                   ann.GenomeIntervalTree.from_index(self.gt.save_index(self.refgene, self.outdir))]:
+            self.assertEqual(set(gt._pending), {'1', '11'})
+            # unbuilt chromosomes are members, without being built
+            self.assertTrue('1' in gt and '11' in gt and gt.has_key('11'))
+            self.assertFalse('Y' in gt)
+            self.assertEqual(set(gt._pending), {'1', '11'})
+            transcripts = [x[2] for x in gt.get('1')[144146810:146467744]]
+            self.assertEqual(set(gt._pending), {'11'})
+            self.assertEqual(ann.transcript_info_from_transcripts(transcripts, 0, sys.maxint),
+                             ann.transcript_info_from_transcripts(self.transcripts, 0, sys.maxint))
+            self.assertIsNone(gt.get('Y'))
+            # listing the chromosomes builds them all
+            self.assertEqual(sorted(gt.keys()), ['1', '11'])
+            self.assertEqual(gt._pending, {})
+            self.assertEqual(sorted((chrom, len(tree)) for chrom, tree in gt.items()),
+                             sorted((chrom, len(tree)) for chrom, tree in self.gt.items()))
+            # chromosomes missing from the table are empty
+            self.assertEqual(len(gt['Y']), 0)
+            self.assertEqual(len(gt), len(self.gt))
+
+        # every way of listing the chromosomes of a lazy tree builds them
+        for chroms in [lambda gt: gt.values(), lambda gt: gt.items(), lambda gt: list(gt),
+                       lambda gt: list(gt.iterkeys()), lambda gt: list(gt.itervalues()), lambda gt: list(gt.iteritems())]:
+            gt = ann.GenomeIntervalTree.from_table(self.refgene, lazy=True)
+            self.assertEqual(len(chroms(gt)), 2)
+
+    def testRefGeneStore(self):
+        """
+        Tests reading gzipped and bzipped refGene tables and the $MUNGE_REFGENE default
+        """
+        import bz2
+        import gzip
+        refgene_gz = os.path.join(self.outdir, 'refgene.txt.gz')
+        refgene_bz2 = os.path.join(self.outdir, 'refgene.txt.bz2')
+        with open(self.refgene) as f, gzip.open(refgene_gz, 'wb') as out_gz, bz2.BZ2File(refgene_bz2, 'wb') as out_bz2:
+            data = f.read()
+            out_gz.write(data)
+            out_bz2.write(data)
+        for refgene in [refgene_gz, refgene_bz2]:
+            for lazy in [False, True]:
+                gt = ann.GenomeIntervalTree.from_table(refgene, lazy=lazy)
+                self.assertEqual(len(gt), len(self.gt))
+
+        environ = os.environ.copy()
+        try:
+            os.environ.pop(ann.REFGENE_ENV, None)
+            self.assertRaises(ValueError, ann.GenomeIntervalTree.from_table)
+            os.environ[ann.REFGENE_ENV] = os.path.join(self.outdir, 'missing.txt.gz')
+            self.assertRaises(IOError, ann.GenomeIntervalTree.from_table)
+            os.environ[ann.REFGENE_ENV] = refgene_gz
+            self.assertEqual(len(ann.GenomeIntervalTree.from_cache(cache_dir=self.outdir)), len(self.gt))
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+
+    def testUCSCTable(self):
+        """
+        Tests that UCSCTable.data has every column of the table, and only the Transcript
+        fields when building Transcripts
+        """
+        data = ann.UCSCTable(self.refgene).data
+        self.assertEqual(list(data.columns), ann.UCSCTable.REF_GENE_FIELDS)
+        transcript_data = ann.UCSCTable(self.refgene, transcript_fields=True).data
+        self.assertEqual(set(transcript_data.columns), set(ann.UCSCTable.TRANSCRIPT_DTYPES))
+        self.assertEqual(len(transcript_data), len(data))
+        self.assertEqual(list(transcript_data['txStart']), list(data['txStart']))
+
+    def testTranscriptDeferredTree(self):
+        """
+        Tests that a Transcript only builds its tree of Exons, UTRs and Introns when first queried
+        """
+        gt = ann.GenomeIntervalTree.from_table(self.refgene)
+        t = gt['11'][532241:535567].pop()[2]
+        self.assertIsNone(t._tree)
+        self.assertEqual(t.get_annotation(532241), 'HRAS:NM_005343(UTR)')
+        # 6 exons, 4 UTRs and 5 introns
+        self.assertEqual(len(t.tree), 15)
+
+    def testSlots(self):
+        """
+        Tests that Transcripts and SubTranscripts carry no per-instance __dict__ and survive pickling
+        """
+        import cPickle as pickle
+        for backend in sorted(ann.TRANSCRIPT_BACKENDS):
+            gt = ann.GenomeIntervalTree.from_table(self.refgene, backend=backend)
+            t = gt['11'][532241:535567].pop()[2]
+            self.assertFalse(hasattr(t, '__dict__'))
+            for s in t._overlapping(t.tx_start, t.tx_end + 1):
+                self.assertFalse(hasattr(s, '__dict__'))
+            copy = pickle.loads(pickle.dumps(t, pickle.HIGHEST_PROTOCOL))
+            self.assertEqual(copy.get_annotation(532241, 535567), t.get_annotation(532241, 535567))
+
+    def testArrayTranscript(self):
+        """
+        Tests that the array backend annotates every transcript identically to the tree backend,
+        at exon, UTR and intron boundaries and over ranges spanning them
+        """
+        array_gt = ann.GenomeIntervalTree.from_table(self.refgene, backend='array')
+        for chrom in ['1', '11']:
+            tree_transcripts = sorted(x[2] for x in self.gt[chrom])
+            array_transcripts = sorted(x[2] for x in array_gt[chrom])
+            self.assertEqual(len(tree_transcripts), len(array_transcripts))
+            for t, a in zip(tree_transcripts, array_transcripts):
+                self.assertIsInstance(a, ann.ArrayTranscript)
+                bounds = set([t.tx_start - 1, t.tx_end + 1, t.cd_start, t.cd_end])
+                for start, end in zip(t.exon_starts, t.exon_ends):
+                    bounds.update([start - 1, start, end, end + 1])
+                bounds = sorted(bounds)
+                queries = [(x, None) for x in bounds] + zip(bounds, bounds[3:]) + [(0, sys.maxint)]
+                for start, stop in queries:
+                    for report_utr in [True, False]:
+                        self.assertEqual(t.get_annotation(start, stop, report_utr), a.get_annotation(start, stop, report_utr))
+                        self.assertEqual(t.get_region_types(start, stop, report_utr), a.get_region_types(start, stop, report_utr))
+                        self.assertEqual([(e.number, e.start, e.end) for e in t.get_exons(start, stop, report_utr)],
+                                         [(e.number, e.start, e.end) for e in a.get_exons(start, stop, report_utr)])
+
     def testGetLocation01(self):
         """
         Tests string arguments
@@ -43,6 +226,22 @@ class TestAnnotation(TestBase):
         loc = ann.get_location(1, 1, 1)
         self.assertEquals(loc, 'chr1:1')
 
+    def testNormalizeChrom(self):
+        """
+        Tests normalizing single chromosomes and Series of them
+        """
+        import pandas as pd
+        for chrom in ['chr7', '7', 7]:
+            self.assertEqual(ann.normalize_chrom(chrom), '7')
+        self.assertEqual(ann.normalize_chrom(23), 'X')
+        self.assertRaises(KeyError, ann.normalize_chrom, 'chr6_ssto_hap7')
+        self.assertIsNone(ann.normalize_chrom('chr6_ssto_hap7', None))
+        chroms = pd.Series(['chrX', 'chr6_ssto_hap7', '1', None, 'chrX', 22], index=[5, 4, 3, 2, 1, 0])
+        normalized = ann.normalize_chroms(chroms)
+        self.assertEqual(list(normalized.index), list(chroms.index))
+        self.assertEqual(list(normalized), ['X', None, '1', None, 'X', '22'])
+        self.assertEqual(list(ann.normalize_chroms([1, 'MT'])), ['1', 'MT'])
+
     def testSplitString(self):
         """
         Tests spliting a string given string of split characters
@@ -543,3 +742,24 @@ class TestAnnotation(TestBase):
                          ['NBPF20:NM_001278267(intron 53)', 'NBPF9:NM_001277444(intron 21)', 'PDE4DIP:NM_022359(UTR)'])
         self.assertEqual(ann.transcript_info_from_transcripts(self.transcripts, 145076000, report_utr=False),
                          ['NBPF20:NM_001278267(intron 53)', 'NBPF9:NM_001277444(intron 21)', 'PDE4DIP:NM_022359(exon 01)'])
+
+    def testAnnotateMany(self):
+        """Test batch annotation of many intervals against per-interval IntervalTree queries"""
+        chroms = ['1', '1', '1', '1', '11', '11', '22']
+        starts = [0, 144146810, 145076000, 145076000, 532241, 533000, 100]
+        stops = [1, 146467744, 145076001, 145100000, 532242, 535567, 200]
+        transcripts = self.gt.transcripts_many(chroms, starts, stops)
+        for chrom, start, stop, batch in zip(chroms, starts, stops, transcripts):
+            self.assertEqual(batch, [x[2] for x in sorted(self.gt[chrom][start:stop])])
+
+        df = self.gt.annotate_many(chroms, starts, stops)
+        self.assertEqual(list(df.columns), ['gene', 'transcript', 'region'])
+        self.assertEqual(len(df), len(chroms))
+        for i, (chrom, start, stop) in enumerate(zip(chroms, starts, stops)):
+            t = [x[2] for x in self.gt[chrom][start:stop]]
+            self.assertEqual(df['gene'][i], ';'.join(ann.gene_info_from_transcripts(t, start, stop)))
+            self.assertEqual(df['transcript'][i], ';'.join(ann.transcript_info_from_transcripts(t, start, stop)))
+            self.assertEqual(df['region'][i], ';'.join(ann.region_info_from_transcripts(t, start, stop)))
+        self.assertEqual(df['region'][2], 'INTRONIC;UTR')
+
+        self.assertRaises(ValueError, self.gt.annotate_many, ['1'], [10], [10])
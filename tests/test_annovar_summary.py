@@ -9,6 +9,7 @@ import pprint
 import csv
 import sys
 import json
+import argparse
 
 from munging.subcommands import annovar_summary
 
@@ -17,6 +18,7 @@ import __init__ as config
 log = logging.getLogger(__name__)
 
 summary_testfiles = path.join(config.datadir, 'annovar_summary')
+vcf_testfiles = path.join(config.datadir, 'annovar_summary_vcf')
 
 control ='NA12878-GEN08-HHv1'
 NM_dict = {
@@ -181,6 +183,187 @@ class TestSummary(TestBase):
         self.assertEqual(read_info1,('90', '10', ''))
         self.assertTrue(read_info1,('714', '8', '37'))
 
+    def testAddData(self):
+        """
+        Merge the files of a variant, keeping distinct multi-valued
+        fields in order and the reads with the highest variant count
+        """
+        output = {}
+        for data in [{'Gene': 'PHF6(NM_001015877:exon10:c.969-9T>C)', 'var_type_1': 'intronic',
+                      'Read_Headers': data4['Read_Headers'], 'Reads': data4['Reads']},
+                     {'Gene': 'PHF6', 'var_type_1': 'splicing', 'Transcripts': 'PHF6:NM_032458'},
+                     {'var_type_1': 'intronic', 'Read_Headers': data4['Read_Headers'],
+                      'Reads': '0/1:24:725:724:700:20:2.8%:3.8308E-3:37:36:350:350:10:10'},
+                     {'Read_Headers': data4['Read_Headers'],
+                      'Reads': '0/1:24:725:724:710:3:0.4%:3.8308E-3:37:35:355:355:2:1'}]:
+            annovar_summary.add_data(output, dict(data))
+
+        self.assertEqual(output['Gene'], 'PHF6(NM_001015877:exon10:c.969-9T>C)')
+        self.assertEqual(output['var_type_1'], ('intronic', 'splicing'))
+        self.assertEqual(output['Transcripts'], 'PHF6:NM_032458')
+        self.assertEqual((output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred']), ('700', '20', '36'))
+
+        data = annovar_summary.munge_variant(output, {})
+        self.assertEqual(data['Variant_Type'], 'intronic,splicing')
+
+        #reads whose counts are not numbers are kept as written, and keep the reads seen first
+        missing = '0/1:24:725:724:.:.:.:3.8308E-3:37:.:357:357:.:.'
+        for reads, expected in [([missing], ('.', '.', '.')),
+                                ([missing, data4['Reads']], ('.', '.', '.')),
+                                ([data4['Reads'], missing], ('714', '8', '37'))]:
+            output = {}
+            for r in reads:
+                annovar_summary.add_data(output, {'Read_Headers': data4['Read_Headers'], 'Reads': r})
+            self.assertEqual((output['Ref_Reads'], output['Var_Reads'], output['Variant_Phred']), expected)
+
+    def testMergeDataJoinedValues(self):
+        """
+        A value is added to a column unless it is part of the ',' joined
+        values already seen, even spanning several of them
+        """
+        merged = []
+        for values in [['intronic', 'splicing', 'intronic,splicing'],
+                       ['intronic', 'splicing', 'ic,sp', 'tron', 'exonic'],
+                       ['exonic', 'exonic,splicing', 'splicing']]:
+            output = {}
+            for value in values:
+                annovar_summary.add_data(output, {'var_type_1': value})
+            merged.append(annovar_summary.munge_variant(output, {})['Variant_Type'])
+        self.assertListEqual(merged, ['intronic,splicing', 'intronic,splicing,exonic', 'exonic,exonic,splicing'])
+
+    def copy_testfiles(self, name):
+        """
+        Copy the annovar outputs of control to the outdir as
+        name.merged.*, and write a RefSeqs file of NM_dict for them
+        """
+        infiles = []
+        for fname in sorted(os.listdir(summary_testfiles)):
+            if fname.startswith(control):
+                infile = path.join(self.outdir, fname.replace(control, name + '.merged'))
+                with open(path.join(summary_testfiles, fname)) as src, open(infile, 'w') as dest:
+                    dest.write(src.read())
+                infiles.append(infile)
+        refseqs = path.join(self.outdir, name + '_refseqs.txt')
+        with open(refseqs, 'w') as f:
+            f.write('Gene\tRefSeq\n')
+            f.writelines('G\t{}\n'.format(v) for v in NM_dict.values())
+        return infiles, refseqs
+
+    def testStream(self):
+        """
+        The streaming merge, and reading files in parallel, write the
+        same summary as accumulating every variant
+        """
+        infiles, refseqs = self.copy_testfiles('stream')
+
+        outputs = []
+        for stream, chunk_rows, jobs in [(False, None, 1), (True, 100000, 1), (True, 100, 1), (False, None, 2)]:
+            outfile = path.join(self.outdir, 'stream_{}_{}_{}.txt'.format(stream, chunk_rows, jobs))
+            with open(refseqs) as RefSeqs, open(outfile, 'w') as out:
+                args = argparse.Namespace(RefSeqs=RefSeqs, type='SNP', infiles=[infiles], outfile=out,
+                                          strict=False, stream=stream, chunk_rows=chunk_rows, jobs=jobs)
+                annovar_summary.action(args)
+            with open(outfile) as f:
+                outputs.append(f.read())
+        self.assertGreater(len(outputs[0].splitlines()), 2000)
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(outputs[2], outputs[0])
+        self.assertEqual(outputs[3], outputs[0])
+        #the streaming merge reads its files in one process
+        args = argparse.Namespace(RefSeqs=None, type='SNP', infiles=[infiles], outfile=None,
+                                  strict=False, stream=True, chunk_rows=100, jobs=2)
+        self.assertRaises(SystemExit, annovar_summary.action, args)
 
+    def testVCF(self):
+        """
+        Summarize a VCF annotated by table_annovar.pl -vcfinput
+        """
+        varscan = 'GT:GQ:SDP:DP:RD:AD:FREQ:PVAL:RBQ:ABQ:RDF:RDR:ADF:ADR'
+        records = [
+            ['1', '11168292', '.', 'A', 'G', '.', 'PASS',
+             'ADP=3373;ANNOVAR_DATE=2016-02-01;Func.refGene=exonic;Gene.refGene=MTOR;GeneDetail.refGene=.;'
+             'ExonicFunc.refGene=nonsynonymous_SNV;AAChange.refGene=MTOR:NM_004958:exon57:c.7580T>C:p.L2527P;'
+             'ExAC_ALL=2.471e-05;ExAC_AFR=0;CADD=4.266670,22.3;ALLELE_END',
+             varscan, '0/1:41:3373:3373:3345:22:0.65%:7.6264E-5:26:21:1702:1643:11:11'],
+            ['2', '25457290', 'rs1', 'CAG', 'C', '51.2', 'PASS',
+             'ANNOVAR_DATE=2016-02-01;Func.refGene=splicing\\x3bintronic;Gene.refGene=TET2;'
+             'GeneDetail.refGene=NM_022552:exon23:c.2598-8T>C;genomicSuperDups=Score\\x3d0.98\\x3bName\\x3dchr2;ALLELE_END',
+             'GT:AD:DP:GQ:PL', '1/1:0,12:12:36:400,36,0'],
+            ['X', '123156459', '.', 'T', 'TC,G', '.', 'PASS',
+             'ANNOVAR_DATE=2016-02-01;Func.refGene=UTR5;Gene.refGene=STAG2;GeneDetail.refGene=NM_006603:c.-19_-18insC;ALLELE_END;'
+             'ANNOVAR_DATE=2016-02-01;Func.refGene=UTR5;Gene.refGene=STAG2;GeneDetail.refGene=NM_006603:c.-19T>G;'
+             '1000g2015aug_all=0.01;ALLELE_END',
+             varscan, '1/2:21:637:636:625:7:1.1%:7.6831E-3:26:27:625:0:7:0'],
+            #without table_annovar's markers, every field is of every allele
+            ['X', '123179197', '.', 'G', 'A,T', '.', 'PASS',
+             'Func.refGene=exonic;Gene.refGene=STAG2;ExonicFunc.refGene=stopgain;1000g2015aug_all=0.02',
+             varscan, '1/2:21:637:636:625:7:1.1%:7.6831E-3:26:27:625:0:7:0'],
+        ]
+        vcf = path.join(self.outdir, 'vcf.hg19_multianno.vcf')
+        with open(vcf, 'w') as f:
+            f.write('##fileformat=VCFv4.1\n')
+            f.write('#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNA12878\n')
+            f.writelines('\t'.join(record) + '\n' for record in records)
+        refseqs = path.join(self.outdir, 'vcf_refseqs.txt')
+        with open(refseqs, 'w') as f:
+            f.write('Gene\tRefSeq\nMTOR\tNM_004958.1\nSTAG2\tNM_006603.4\n')
+
+        outputs = []
+        for stream in [False, True]:
+            outfile = path.join(self.outdir, 'vcf_{}.txt'.format(stream))
+            with open(refseqs) as RefSeqs, open(outfile, 'w') as out:
+                args = argparse.Namespace(RefSeqs=RefSeqs, type='SNP', infiles=[[vcf]], outfile=out,
+                                          strict=False, stream=stream, chunk_rows=100000, jobs=1)
+                annovar_summary.action(args)
+            with open(outfile) as f:
+                outputs.append(list(csv.DictReader(f, delimiter='\t')))
+        self.assertEqual(outputs[1], outputs[0])
 
+        mtor, tet2, stag2_ins, stag2_snv, stag2_a, stag2_t = outputs[0]
+        self.assertEqual((mtor['Position'], mtor['Ref_Base'], mtor['Var_Base']), ('chr1:11168292', 'A', 'G'))
+        self.assertEqual(mtor['Variant_Type'], 'nonsynonymous SNV,exonic')
+        self.assertEqual((mtor['Gene'], mtor['p.'], mtor['c.']), ('MTOR', 'p.L2527P', 'NM_004958.1:c.7580T>C'))
+        self.assertEqual((mtor['Ref_Reads'], mtor['Var_Reads'], mtor['Variant_Phred']), ('3345', '22', '21'))
+        self.assertEqual((mtor['EXAC'], mtor['CADD'], mtor['Zygosity']), ('2.471e-05', '22.3', 'het'))
+        #deletions and insertions have annovar's coordinates
+        self.assertEqual((tet2['Position'], tet2['Ref_Base'], tet2['Var_Base']), ('chr2:25457291-25457292', 'AG', '-'))
+        self.assertEqual((tet2['Variant_Type'], tet2['Gene'], tet2['Transcripts']),
+                         ('splicing,intronic', 'TET2', 'NM_022552:exon23:c.2598-8T>C'))
+        self.assertEqual((tet2['Segdup'], tet2['Zygosity'], tet2['dbSNP_ID'], tet2['GATK_Score']),
+                         ('segdup', 'hom', 'rs1', '51.2'))
+        self.assertEqual((stag2_ins['Position'], stag2_ins['Ref_Base'], stag2_ins['Var_Base']), ('chrX:123156459', '-', 'C'))
+        #each allele has its own annotation
+        self.assertEqual((stag2_ins['1000g_ALL'], stag2_snv['1000g_ALL']), ('-1', '0.01'))
+        self.assertEqual(stag2_snv['c.'], 'NM_006603.4:c.-19T>G')
+        self.assertEqual([(row['Var_Base'], row['Gene'], row['Variant_Type'], row['1000g_ALL']) for row in [stag2_a, stag2_t]],
+                         [('A', 'STAG2', 'stopgain,exonic', '0.02'), ('T', 'STAG2', 'stopgain,exonic', '0.02')])
 
+    def testVCFTestfiles(self):
+        """
+        The annovar outputs of control, annotated by table_annovar as a
+        VCF, summarize as the outputs do
+        """
+        infiles, refseqs = self.copy_testfiles('vcf')
+        vcf = path.join(vcf_testfiles, control + '.hg19_multianno.vcf.gz')
+        outputs = []
+        for name, files, stream in [('text', infiles, False), ('vcf', [vcf], False), ('vcf_stream', [vcf], True)]:
+            outfile = path.join(self.outdir, 'testfiles_{}.txt'.format(name))
+            with open(refseqs) as RefSeqs, open(outfile, 'w') as out:
+                args = argparse.Namespace(RefSeqs=RefSeqs, type='SNP', infiles=[files], outfile=out,
+                                          strict=False, stream=stream, chunk_rows=100000, jobs=1)
+                annovar_summary.action(args)
+            with open(outfile) as f:
+                outputs.append(list(csv.DictReader(f, delimiter='\t')))
+        text, vcf, vcf_stream = outputs
+        self.assertGreater(len(text), 2000)
+        self.assertEqual(vcf_stream, vcf)
+        self.assertEqual(len(vcf), len(text))
+        #table_annovar writes the spaces of INFO values as '_', as in the
+        #clinical_variants note of one variant
+        differ = [(t, v) for t, v in zip(text, vcf) if t != v]
+        self.assertEqual(len(differ), 1)
+        t, v = differ[0]
+        self.assertEqual(t['Position'], 'chr20:31022441')
+        self.assertEqual(t['Clinically_Flagged'], 'ASXL1 Frameshift seen in OPX-0003T,none')
+        self.assertEqual(v['Clinically_Flagged'], 'ASXL1_Frameshift_seen_in_OPX-0003T,none')
+        self.assertEqual(dict(t, Clinically_Flagged=v['Clinically_Flagged']), v)
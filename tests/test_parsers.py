@@ -10,6 +10,9 @@ import pprint
 import sys
 import json
 import csv
+import shutil
+
+import pandas as pd
 
 from operator import itemgetter
 from itertools import ifilter
@@ -279,4 +282,141 @@ class TestParsers(TestBase):
         specimens, annotation, prefixes, fieldnames, variant_keys=eval(chosen_parser)
         self.assertListEqual(prefixes,['NA12878-HP998-HHv3_AveCoverage','OCIAML3-HP998-HHv3_AveCoverage'])
         self.assertListEqual(fieldnames, ['RegionID', 'Position','NA12878-HP998-HHv3_AveCoverage','OCIAML3-HP998-HHv3_AveCoverage'])
-        self.assertListEqual(variant_keys, ['RegionID', 'Position'])
\ No newline at end of file
+        self.assertListEqual(variant_keys, ['RegionID', 'Position'])
+
+    def testSampleFileIndex(self):
+        files = [Path('run/1_A01_OPXv4_HA0001', '1_A01_OPXv4_HA0001.SNP_Analysis.txt'),
+                 Path('run/11_A01_OPXv4_HA0001', '11_A01_OPXv4_HA0001.SNP_Analysis.txt'),
+                 Path('run/1_A01_OPXv4_HA0001', '1_A01_OPXv4_HA0001.Quality_Analysis.txt'),
+                 Path('run/CFDNA', 'A-NA12878-GLTv1.CFDNA.SNP_Analysis.txt'),
+                 Path('run/B_1_A01_OPXv4_HA0001', 'B_1_A01_OPXv4_HA0001.MSI_Analysis.txt'),
+                 Path('run/S1', 'S1_MSI-PLUS.msi.txt'),
+                 Path('run/S10', 'S10_MSI-PLUS.msi.txt')]
+        index = parsers.SampleFileIndex(iter(files))
+        self.assertIs(parsers.sample_file_index(index), index)
+        #1_A01_OPXv4_HA0001 is a substring of 11_A01_OPXv4_HA0001, but only its own files are found
+        self.assertListEqual(index.find('1_A01_OPXv4_HA0001'), [files[0], files[2]])
+        self.assertListEqual(index.find('1_A01_OPXv4_HA0001', filters.snp_analysis), [files[0]])
+        #files are keyed on the prefix munge_pfx parses, S1 for S1_MSI-PLUS
+        self.assertListEqual(index.find('S1'), [files[5]])
+        #samples that are not a whole file prefix still match part of the file name
+        self.assertListEqual(index.find('A-NA12878'), [files[3]])
+        self.assertListEqual(index.find('NOT_A_SAMPLE'), [])
+        #but samples with files never get the files of another sample
+        self.assertListEqual(index.find('1_A01_OPXv4_HA0001', filters.msi_analysis), [])
+        self.assertListEqual(index.find('11_A01_OPXv4_HA0001', filters.quality_analysis), [])
+
+    def testParseParallel(self):
+        """parse_parallel merges per-sample results exactly as the serial parsers do"""
+        sort_order=['0228T_CON_OPXv4_INT','5437_E05_OPXv4_NA12878_MA0013','6037_E05_OPXv4_NA12878_HA0201']
+        files = parsers.SampleFileIndex(ifilter(filters.any_analysis, walker(testfiles)))
+        for parser_type in ['snp', 'pindel', 'quality', 'hotspot_flagged', 'breakdancer']:
+            serial = getattr(parsers, 'parse_' + parser_type)(files, defaultdict(dict), {}, [], [], sort_order)
+            parallel = parsers.parse_parallel(parser_type, files, defaultdict(dict), {}, [], [], sort_order, 2)
+            self.assertDictEqual(dict(parallel[0]), dict(serial[0]))
+            self.assertListEqual(parallel[2], serial[2])
+            self.assertListEqual(parallel[3], serial[3])
+            self.assertListEqual(parallel[4], serial[4])
+            for variant in serial[0]:
+                self.assertEqual(parallel[1][variant], serial[1][variant])
+
+    def testSummaryTypes(self):
+        """Summary types sharing a parser, like indel and snp, parse alike"""
+        sort_order=['0228T_CON_OPXv4_INT','5437_E05_OPXv4_NA12878_MA0013','6037_E05_OPXv4_NA12878_HA0201']
+        files = parsers.SampleFileIndex(ifilter(filters.any_analysis, walker(testfiles)))
+        indel = parsers.parse('indel', files, defaultdict(dict), {}, [], [], sort_order)
+        snp = parsers.parse_snp(files, defaultdict(dict), {}, [], [], sort_order)
+        self.assertDictEqual(dict(indel[0]), dict(snp[0]))
+        self.assertListEqual(indel[3], snp[3])
+        self.assertRaises(KeyError, parsers.parse, 'not_a_summary', files, defaultdict(dict), {}, [], [], sort_order)
+
+    def testGenotypeStatus(self):
+        self.assertEqual(parsers.vaf({'Variant_Reads': '5', 'Valid_Reads': '0'}), '0')
+        self.assertEqual(parsers.msi_status('0.0150', '100'), 'IND')
+        self.assertEqual(parsers.msi_status('0.5000', '99'), 'REVIEW')
+        self.assertEqual(parsers.hotspot_status('0.1500', '50'), 'REVIEW')
+        self.assertEqual(parsers.glt_status('0.9500', '100'), 'HOMO')
+
+    def testParseFrame(self):
+        """parse_frame reports the same summary as parse"""
+        sort_order=['0228T_CON_OPXv4_INT','5437_E05_OPXv4_NA12878_MA0013','6037_E05_OPXv4_NA12878_HA0201']
+        files = parsers.SampleFileIndex(ifilter(filters.any_analysis, walker(testfiles)))
+        for summary_type in ['snp', 'pindel', 'quality', 'msi_flagged', 'hotspot_flagged', 'glt_flagged', 'cnv_gene']:
+            specimens, annotation, prefixes, fieldnames, variant_keys = parsers.parse(
+                summary_type, files, defaultdict(dict), {}, [], [], sort_order)
+            summary, frame_fieldnames = parsers.parse_frame(summary_type, files, sort_order)
+            self.assertListEqual(frame_fieldnames, fieldnames)
+            self.assertListEqual(list(summary.columns), fieldnames)
+            self.assertEqual(len(summary), len(specimens))
+            for (i, row), variant in zip(summary.iterrows(), sorted(specimens)):
+                d = dict(zip(variant_keys, variant))
+                d.update(specimens[variant])
+                d.update(annotation[variant])
+                #missing values are both written as ''
+                for field in fieldnames:
+                    expected = d.get(field)
+                    self.assertEqual('' if expected is None else str(expected),
+                                     '' if pd.isnull(row[field]) else str(row[field]))
+
+    def testGenotypeStatusFrame(self):
+        """Vectorized status calling agrees with calling each site"""
+        fracs = ['{0:.4f}'.format(f / 1000.0) for f in range(0, 1001, 5)] + ['0.0100', '0.0200', '0.5800', '0']
+        for reads in ['0', '49', '50', '99', '100', '5000']:
+            frac = pd.Series(fracs)
+            valid = pd.Series([reads] * len(fracs))
+            for status in parsers.GENOTYPE_STATUS.values():
+                self.assertListEqual(list(status.frame(frac, valid)), [status(f, reads) for f in fracs])
+
+    def testParseStream(self):
+        """parse_stream reports the same rows as parse, merging sorted sample files"""
+        sort_order=['0228T_CON_OPXv4_INT','5437_E05_OPXv4_NA12878_MA0013','6037_E05_OPXv4_NA12878_HA0201']
+        files = parsers.SampleFileIndex(ifilter(filters.any_analysis, walker(testfiles)))
+        for summary_type in ['snp', 'pindel', 'quality', 'msi_flagged', 'hotspot_flagged', 'breakdancer']:
+            specimens, annotation, prefixes, fieldnames, variant_keys = parsers.parse(
+                summary_type, files, defaultdict(dict), {}, [], [], sort_order)
+            stream_fieldnames, rows = parsers.parse_stream(summary_type, files, sort_order)
+            self.assertListEqual(stream_fieldnames, fieldnames)
+            rows = list(rows)
+            self.assertEqual(len(rows), len(specimens))
+            for row, variant in zip(rows, sorted(specimens)):
+                d = dict(zip(variant_keys, variant))
+                d.update({pfx:specimens[variant].get(pfx) for pfx in prefixes})
+                d.update(annotation[variant])
+                self.assertDictEqual(row, d)
+
+    def testSortedRows(self):
+        outdir = self.mkoutdir()
+        fname = path.join(outdir, 'unsorted.txt')
+        with open(fname, 'w') as f:
+            f.write('Position\tReads\nchr2:10\t1\nchr1:20\t2\nchr1:10\t3\nchr1:20\t4\n')
+        rows = list(parsers.sorted_rows(fname, itemgetter('Position'), outdir))
+        self.assertListEqual([(key, row['Reads']) for key, lineno, row in rows],
+                             [('chr1:10', '3'), ('chr1:20', '2'), ('chr1:20', '4'), ('chr2:10', '1')])
+
+    def testParseIncremental(self):
+        """parse_incremental re-reads only changed samples, and reports what parse does"""
+        sort_order=['0228T_CON_OPXv4_INT','5437_E05_OPXv4_NA12878_MA0013','6037_E05_OPXv4_NA12878_HA0201']
+        run = path.join(self.outdir, 'output')
+        shutil.rmtree(run, ignore_errors=True)
+        shutil.copytree(testfiles, run)
+        files = parsers.SampleFileIndex(ifilter(filters.any_analysis, walker(run)))
+        changed = files.find(sort_order[1], filters.snp_analysis)[0]
+        changed = path.join(changed.dir, changed.fname)
+        for summary_type in ['snp', 'quality']:
+            expected = parsers.parse(summary_type, files, defaultdict(dict), {}, [], [], sort_order)
+            for jobs in [1, 2]:
+                result = parsers.parse_incremental(summary_type, files, defaultdict(dict), {}, [], [], sort_order, jobs)
+                self.assertDictEqual(dict(result[0]), dict(expected[0]))
+                self.assertDictEqual(result[1], expected[1])
+                self.assertListEqual(list(result[2:]), list(expected[2:]))
+
+        self.assertIsNotNone(parsers.load_sample_cache(changed, 'snp'))
+        with open(changed) as f:
+            lines = f.readlines()
+        with open(changed, 'w') as f:
+            f.writelines(lines[:-1])
+        self.assertIsNone(parsers.load_sample_cache(changed, 'snp'))
+        expected = parsers.parse('snp', files, defaultdict(dict), {}, [], [], sort_order)
+        result = parsers.parse_incremental('snp', files, defaultdict(dict), {}, [], [], sort_order)
+        self.assertDictEqual(dict(result[0]), dict(expected[0]))
+        self.assertIsNotNone(parsers.load_sample_cache(changed, 'snp'))
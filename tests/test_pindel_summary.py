@@ -7,6 +7,9 @@ import filecmp
 import logging
 import os
 
+import pandas as pd
+
+import munging.annotation as ann
 from munging.subcommands import pindel_summary
 from intervaltree import Interval
 from __init__ import TestBase
@@ -69,6 +72,15 @@ class TestPindelSummary(TestBase):
         subprocess.call(cmd)
         self.assertTrue(filecmp.cmp(expected_output, simpletsv))
 
+    def testExonBoundary(self):
+        # Test when an event ends right at the start of an exon: the end
+        # breakend is the unaffected nucleotide, so the region is intronic
+        gt = ann.GenomeIntervalTree.from_table(self.refgene)
+        df = pd.DataFrame({'CHROM': ['X', 'X', 'X'], 'POS': [66863000] * 3, 'End': [66863096, 66863097, 66863098]})
+        annotations = pindel_summary.get_annotations(df, gt)
+        self.assertEqual(list(annotations['Gene_Region']), ['INTRONIC', 'INTRONIC', 'EXONIC'])
+        self.assertEqual(list(annotations['Gene']), ['AR'] * 3)
+
     def testPindelSummaryMultiRead(self):
         # Test when start/stop are in coding (ie normal case)
         # Test when start/stop are not incoding (ie intergenic case)
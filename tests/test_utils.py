@@ -11,7 +11,8 @@ import pprint
 import sys
 import json
 
-from munging.utils import munge_path, munge_pfx, munge_date, validate_gene_list
+from munging import filters, utils
+from munging.utils import munge_path, munge_pfx, munge_date, validate_gene_list, walker, Path, external_sort
 
 from __init__ import TestBase
 import __init__ as config
@@ -131,3 +132,40 @@ class TestUtils(TestBase):
         mask_codes2=['AP3B1','ITK','LYST','MAGT1','PRF1','RAB27A','SH2D1A',]
         validate_gene_list(mask_codes1, valid_genes)
         validate_gene_list(mask_codes2, valid_genes)
+
+    def testWalker(self):
+        run = path.join(config.datadir, '101010_HA0000_OncoPlex1')
+        expected = [Path(pth, fname) for pth, dirs, files in os.walk(run) for fname in files]
+        self.assertListEqual(list(walker(run)), expected)
+        scandir, utils.scandir = utils.scandir, None
+        try:
+            self.assertListEqual(list(walker(run)), expected)
+        finally:
+            utils.scandir = scandir
+        analysis = [p for p in expected if filters.any_analysis(p)]
+        self.assertListEqual(list(walker(run, pattern=filters.ANALYSIS_PATTERN)), analysis)
+        self.assertListEqual(list(walker(run, pattern=filters.combine(filters.ANALYSIS_PATTERN, r'\.csv$'))),
+                             [p for p in expected if filters.any_analysis(p) or p.fname.endswith('.csv')])
+        self.assertListEqual(list(walker(run, max_depth=0)),
+                             [p for p in expected if p.dir == run])
+        self.assertListEqual(list(walker(run, max_depth=1)),
+                             [p for p in expected if path.dirname(p.dir) in (run, path.dirname(run))])
+        self.assertListEqual(list(walker(run, prune=lambda p: p.fname == 'output')),
+                             [p for p in expected if not p.dir.startswith(path.join(run, 'output'))])
+
+    def testExternalSort(self):
+        rows = [[str((i * 7919) % 13), str(i)] for i in range(100)]
+        key = lambda row: row[0]
+        for chunk_rows in [1, 7, 99, 100, 1000]:
+            self.assertListEqual(list(external_sort(rows, key, chunk_rows)), sorted(rows, key=key))
+        self.assertListEqual(list(external_sort([], key, 10)), [])
+        #chunks are merged at most fan_in at a time, in as many passes as it takes
+        tmpdir = self.mkoutdir()
+        for chunk_rows, fan_in in [(1, 2), (3, 2), (7, 3), (7, 15), (7, 16)]:
+            self.assertListEqual(list(external_sort(rows, key, chunk_rows, tmpdir, fan_in)), sorted(rows, key=key))
+            self.assertListEqual(os.listdir(tmpdir), [])
+        #as are temporary files of rows not read
+        rows = external_sort(rows, key, 7, tmpdir, 2)
+        next(rows)
+        rows.close()
+        self.assertListEqual(os.listdir(tmpdir), [])